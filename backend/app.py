@@ -2,19 +2,19 @@ import base64
 import json
 import logging
 import os
+import uuid
 import wave
 import audioop
 import numpy as np
 from scipy import signal
 from google.cloud import speech_v1
 from google.cloud import texttospeech
-from quart import Quart, request, jsonify, websocket
+from quart import Quart, Response, request, jsonify, websocket, g
 from quart_cors import cors
 from dotenv import load_dotenv
 from twilio.twiml.voice_response import VoiceResponse, Connect
 from google.generativeai.types import HarmCategory, HarmBlockThreshold 
 import google.generativeai as genai
-import httpx
 from firebase_admin import credentials, firestore, initialize_app
 from typing import Optional, List, Dict, Any, Union
 import asyncio
@@ -23,25 +23,41 @@ from async_lru import alru_cache
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 import aioredis
-from aioredis import Redis
-from datetime import datetime
 from twilio.rest import Client
-import requests
 from pydantic import ValidationError, BaseModel
 from validators import ChatRequest, AudioConfig, WebSocketConfig
 from config import settings
-from middleware import SecurityMiddleware, MonitoringMiddleware
-import backoff
+from middleware import (
+    Layer, MonitoringMiddleware, PerformanceMiddleware, SecurityMiddleware, compile_middleware
+)
+from voice_processor import ContextChat, VoicePipeline
+from audio_processor import AudioProcessor, VoiceActivityDetector
+from twilio_media import TwilioMediaStream, pcm_payload
+from ws_frames import FORMAT_S16, FrameError, decode_frame, encode_frame, to_pcm16
+from utils.client_pool import ClientPool
+from utils.connection_lifecycle import connection_lifecycle
+from utils.websocket_manager import WebSocketManager
+from utils.ring_buffer import AudioRingBuffer, BufferOverflowError, BACKPRESSURE
+from utils.dsp_worker import dsp_worker
+from utils.http_client import TwilioHttpClient, outbound
+from utils.executors import executor_stats, run_io, shutdown_executors
+from utils.performance_monitor import loop_lag_monitor, metrics
+from utils.request_screening import ip_blocklist
+from utils.message_queue import message_bus
+from utils.redis_rate_limiter import RedisRateLimiter, RateLimitResult
+from utils.cache_manager import CacheManager
+from onboarding_cache import OnboardingReplyCache
+from tts_cache import tts_cache, load_prewarm_phrases
 from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
 import uvloop
 import orjson
 import time
-from asyncio import Queue
 
 # Add missing validator classes
 class ChatRequest(BaseModel):
     history: List[Dict[str, Any]]
+    business_id: Optional[str] = None
+    persona: Dict[str, Any] = {}
     
 class AudioConfig(BaseModel):
     sample_rate: int = 16000
@@ -51,6 +67,7 @@ class AudioConfig(BaseModel):
 class WebSocketConfig(BaseModel):
     business_id: str
     mode: str = "realtime"
+    protocol: str = "json"  # "binary": audio in binary frames, see ws_frames
 
 # Add missing settings class
 class Settings(BaseModel):
@@ -84,33 +101,15 @@ app = Quart(__name__)
 # En production, restreignez l'origine au domaine de votre frontend
 app = cors(app, allow_origin="*")
 
-# Security Middleware
-app = SecurityMiddleware(app)
-
-# Remove redis-rate-limit import and replace with custom implementation
-class RateLimiter:
-    def __init__(self, redis: Redis, key_prefix: str = "rate_limit:", limit: int = 100, window: int = 60):
-        self.redis = redis
-        self.key_prefix = key_prefix
-        self.limit = limit
-        self.window = window
-
-    async def is_allowed(self, key: str, scope: dict) -> bool:
-        current = datetime.now().timestamp()
-        key = f"{self.key_prefix}{key}:{scope['path']}"
-        
-        async with self.redis.pipeline() as pipe:
-            try:
-                # Clean old requests and add new one
-                await pipe.zremrangebyscore(key, 0, current - self.window)
-                await pipe.zadd(key, {str(current): current})
-                await pipe.zcard(key)
-                await pipe.expire(key, self.window)
-                results = await pipe.execute()
-                return results[2] <= self.limit
-            except Exception as e:
-                logging.error(f"Rate limiter error: {e}")
-                return True  # Allow on error
+# The ASGI stack is composed once here, outermost layer first; skip rules
+# keep probes and the metrics scrape out of the heavier layers
+HEALTH_PATHS = frozenset({"/health", "/health/live", "/health/ready"})
+app.asgi_app = compile_middleware(app.asgi_app, [
+    Layer(PerformanceMiddleware),
+    Layer(SecurityMiddleware, skip_paths=HEALTH_PATHS),
+    Layer(MonitoringMiddleware, skip_paths=HEALTH_PATHS | {"/metrics"},
+          skip_prefixes=("/metrics/",), skip_types=frozenset({"websocket"})),
+], timed=settings.MIDDLEWARE_TIMING)
 
 # Update Redis initialization
 redis = aioredis.from_url(
@@ -119,16 +118,28 @@ redis = aioredis.from_url(
     decode_responses=True
 )
 
-rate_limiter = RateLimiter(
+rate_limiter = RedisRateLimiter(
     redis=redis,
-    limit=100,  # requests
-    window=60   # seconds
+    limit=settings.RATE_LIMIT_REQUESTS,
+    window=settings.RATE_LIMIT_WINDOW
 )
 
+async def check_rate_limit() -> RateLimitResult:
+    result = await rate_limiter.check(request.remote_addr, request.scope)
+    g.rate_limit = result
+    return result
+
+@app.after_request
+async def add_rate_limit_headers(response):
+    result = g.get('rate_limit')
+    if result is not None:
+        response.headers.update(result.headers())
+    return response
+
 # Example usage in route
 @app.route("/twilio-voice", methods=["POST"])
 async def twilio_voice():
-    if not await rate_limiter.is_allowed(request.remote_addr, request.scope):
+    if not (await check_rate_limit()).allowed:
         return jsonify({"error": "Rate limit exceeded"}), 429
         
     # ...existing route code...
@@ -151,24 +162,61 @@ except KeyError:
     logging.error("FATAL : GEMINI_API_KEY non trouvé")
     exit(1)
 
-@backoff.on_exception(
-    backoff.expo,
-    (httpx.RequestError, TimeoutError),
-    max_tries=3
+# One cache per worker, so invalidations from peers reach its L1
+cache_manager = CacheManager()
+onboarding_cache = OnboardingReplyCache(
+    cache_manager.cache,
+    opt_out=[b.strip() for b in settings.ONBOARDING_CACHE_OPT_OUT.split(',') if b.strip()]
 )
+
+# Twilio REST calls (the *_async methods) share the pooled outbound client
+twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=TwilioHttpClient(outbound))
+
 async def make_api_request(url, data):
-    async with httpx.AsyncClient() as client:
-        return await client.post(url, json=data, timeout=10.0)
+    # Webhook deliveries were always retried; the shared retry budget now bounds that
+    return await outbound.post(url, json=data, timeout=10.0, retry=True)
+
+class ConnectionPools:
+    """Process-wide pools of Google clients; sessions borrow instead of owning them"""
+    def __init__(self):
+        self.speech = ClientPool('speech', speech_v1.SpeechClient)
+        self.tts = ClientPool('tts', texttospeech.TextToSpeechClient)
+        self.gemini = ClientPool('gemini', lambda: genai.GenerativeModel('gemini-pro'))
+
+    def all(self) -> Dict[str, ClientPool]:
+        return {'speech': self.speech, 'tts': self.tts, 'gemini': self.gemini}
+
+    async def start(self):
+        await asyncio.gather(*(pool.start() for pool in self.all().values()))
+
+    async def close(self):
+        await asyncio.gather(*(pool.close() for pool in self.all().values()))
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: pool.stats() for name, pool in self.all().items()}
+
+pools = ConnectionPools()
+
+# Dashboards subscribed to /metrics/<business_id>, one group per business
+METRICS_GROUP_PREFIX = "metrics:"
+ws_manager = WebSocketManager()
+metrics_publisher: Optional[asyncio.Task] = None
 
 # --- WebSocket Handler ---
 class AudioSession:
-    def __init__(self, business_id):
+    """One phone call: 16-bit mono PCM in, spoken replies out.
+
+    Both directions use ``sample_rate``. Replies are raw PCM with no WAV
+    header, the format ``TwilioMediaStream.encode_outbound`` expects.
+    """
+    def __init__(self, business_id, clients: ConnectionPools = pools, sample_rate: int = 16000):
         self.business_id = business_id
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.chat = self.model.start_chat(context=self.generate_system_prompt(business_id))
-        self.speech_client = speech_v1.SpeechClient()
-        self.tts_client = texttospeech.TextToSpeechClient()
+        self.clients = clients
+        self.sample_rate = sample_rate
+        self.context = self.generate_system_prompt(business_id)
+        self.history = []
         self.buffer = []
+        self.vad = VoiceActivityDetector(sample_rate=sample_rate)
         self.processing = False
         self._active = True
 
@@ -178,133 +226,138 @@ class AudioSession:
     async def cleanup(self):
         self._active = False
         self.buffer.clear()
+        self.history = []
+        self.vad.reset()
         self.processing = False
 
-    async def process_audio_chunk(self, audio_data):
+    async def process_audio_chunk(self, audio_data: bytes) -> Optional[bytes]:
+        """Feed inbound PCM; returns reply PCM for any utterance it completed"""
         try:
             if not self._active:
                 return None
-                
-            audio_config = AudioConfig(
-                sample_rate=16000,
-                channels=1,
-                format="wav"
-            )
-            
-            # Define or import AudioProcessor to avoid undefined error
-            # Define a placeholder AudioProcessor class if the module is missing
-            class AudioProcessor:
-                @staticmethod
-                def normalize_audio(audio_data, target_sample_rate):
-                    # Example normalization logic
-                    return audio_data
-
-                @staticmethod
-                def detect_speech(audio_data):
-                    # Example speech detection logic
-                    return True
-            
-            processed_audio = AudioProcessor.normalize_audio(
-                audio_data, 
-                target_sample_rate=audio_config.sample_rate
-            )
-            
-            if not AudioProcessor.detect_speech(processed_audio):
-                return None
-                
-            return await self.process_voice(processed_audio)
+            return await self._respond(self.vad.process(audio_data))
         except Exception as e:
             logging.error(f"Audio processing error: {e}")
             return None
 
-class ConnectionPools:
-    def __init__(self):
-        self.speech_client_pool = []
-        self.tts_client_pool = []
-        self.max_pool_size = settings.MAX_WORKERS
-        self.queue = Queue()
-
-    async def get_speech_client(self):
-        if not self.speech_client_pool:
-            return speech_v1.SpeechClient()
-        return await self.queue.get()
-
-    async def release_speech_client(self, client):
-        await self.queue.put(client)
-
-pools = ConnectionPools()
+    async def flush(self) -> Optional[bytes]:
+        """Answer an utterance still open when the stream ends"""
+        try:
+            if not self._active:
+                return None
+            return await self._respond(self.vad.flush())
+        except Exception as e:
+            logging.error(f"Audio processing error: {e}")
+            return None
 
-class OptimizedAudioSession(AudioSession):
-    def __init__(self, business_id):
-        super().__init__(business_id)
-        self._cache = {}
-        self._last_processed = 0
-        self._buffer_size = settings.CHUNK_SIZE
-        self._queue = Queue(maxsize=10)  # Limit queue size
-    
-    async def process_audio_chunk(self, audio_data):
-        # Add buffering
-        if self._queue.full():
-            _ = await self._queue.get()  # Remove oldest
-        await self._queue.put(audio_data)
-        
-        # Process in batches
-        if self._queue.qsize() >= 3:  # Process when we have 3 chunks
-            chunks = []
-            while not self._queue.empty():
-                chunks.append(await self._queue.get())
-            return await self._process_batch(chunks)
+    async def _respond(self, events) -> Optional[bytes]:
+        audio_config = AudioConfig(
+            sample_rate=self.sample_rate,
+            channels=1,
+            format="wav"
+        )
+
+        # Only complete voiced segments are forwarded to recognition
+        responses = []
+        for event in events:
+            if event.type != VoiceActivityDetector.SPEECH_END:
+                continue
+            processed_audio = await AudioProcessor.normalize_audio_async(
+                event.audio,
+                target_sample_rate=audio_config.sample_rate
+            )
+            response = await self.process_voice(processed_audio)
+            if response:
+                responses.append(response)
+
+        return b''.join(responses) if responses else None
+
+    async def process_voice(self, audio_data: bytes) -> Optional[bytes]:
+        """STT -> Gemini -> TTS for one endpointed utterance; the reply as raw PCM"""
+        pipeline = VoicePipeline(self.clients, self.context, self.history,
+                                 sample_rate=self.sample_rate, tts_cache=tts_cache)
+        # Each sentence is synthesized separately, so strip every WAV header
+        # before joining; headers mid-stream would play as clicks
+        sentences = [pcm_payload(event['audio'])
+                     async for event in pipeline.run(audio_data) if event['type'] == 'audio']
+        self.history = pipeline.history
+        return b''.join(sentences) or None
 
 @app.websocket('/twilio-stream')
 async def twilio_stream():
     business_id = request.args.get('business_id', 'default')
     audio_session = AudioSession(business_id)
-    
+    media_stream = TwilioMediaStream(sample_rate=audio_session.sample_rate)
+
+    async def reply(pcm: Optional[bytes]):
+        if pcm:
+            for frame in media_stream.encode_outbound(pcm, audio_session.sample_rate):
+                await websocket.send(frame)
+
     try:
-        while True:
+        while not media_stream.stopped:
             message = await websocket.receive()
-            if message.get('type') == 'websocket.disconnect':
-                break
-                
-            audio_data = base64.b64decode(message.get('audio', ''))
+            audio_data = media_stream.handle_message(message)
             if not audio_data:
                 continue
                 
-            response_audio = await audio_session.process_audio_chunk(audio_data)
-            if response_audio:
-                await websocket.send({
-                    'audio': base64.b64encode(response_audio).decode('utf-8')
-                })
+            await reply(await audio_session.process_audio_chunk(audio_data))
+
+        # A 'stop' can arrive mid-utterance; don't drop what was said
+        await reply(await audio_session.flush())
     except Exception as e:
         logging.error(f"WebSocket error: {e}")
     finally:
         await audio_session.cleanup()
 
 class VoiceChatSession:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.chat = self.model.start_chat(context="You are a helpful AI assistant conducting a live conversation to gather business information. Be conversational and natural.")
-        self.speech_client = speech_v1.SpeechClient()
-        self.tts_client = texttospeech.TextToSpeechClient()
-        self._buffer = []
+    def __init__(self, clients: ConnectionPools = pools):
+        self.clients = clients
+        self.context = "You are a helpful AI assistant conducting a live conversation to gather business information. Be conversational and natural."
+        self.history = []
+        self._buffer = AudioRingBuffer(capacity=settings.AUDIO_MAX_BUFFER_BYTES, overflow=BACKPRESSURE)
+
+    def buffer_audio(self, samples: np.ndarray):
+        """Accumulate a partial utterance; raises BufferOverflowError when full.
+
+        The buffer goes to recognition as LINEAR16, so float samples (F32
+        frames, JSON arrays) are converted before they are written.
+        """
+        self._buffer.write(to_pcm16(samples))
+
+    def take_buffered_audio(self) -> bytes:
+        return self._buffer.read()
 
     async def cleanup(self):
         """Clean up resources when session ends"""
         self._buffer.clear()
-        self.chat = None
+        self.history = []
+
+    async def process_voice_stream(self, audio_data: bytes):
+        """Pipelined variant of process_voice: yields audio sentence by sentence"""
+        pipeline = VoicePipeline(self.clients, self.context, self.history, tts_cache=tts_cache)
+        try:
+            async for event in pipeline.run(audio_data):
+                yield event
+            self.history = pipeline.history
+        except Exception as e:
+            logging.error(f"Voice pipeline error: {e}")
+            yield {'type': 'error', 'error': "Voice processing failed"}
         
     async def process_voice(self, audio_data: bytes) -> dict:
         try:
             # Convert audio to text
-            response = await self.speech_client.recognize(
-                config=speech_v1.RecognitionConfig(
-                    encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
-                    sample_rate_hertz=16000,
-                    language_code="fr-FR",
-                    enable_automatic_punctuation=True,
-                ),
-                audio=speech_v1.RecognitionAudio(content=audio_data)
-            )
+            async with self.clients.speech.borrow() as speech_client:
+                response = await run_io(
+                    speech_client.recognize,
+                    config=speech_v1.RecognitionConfig(
+                        encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+                        sample_rate_hertz=16000,
+                        language_code="fr-FR",
+                        enable_automatic_punctuation=True,
+                    ),
+                    audio=speech_v1.RecognitionAudio(content=audio_data)
+                )
             
             if not response.results:
                 return None
@@ -312,47 +365,82 @@ class VoiceChatSession:
             transcript = response.results[0].alternatives[0].transcript
 
             # Get AI response
-            ai_response = await self.chat.send_message(transcript)
+            async with self.clients.gemini.borrow() as model:
+                chat = ContextChat(model, self.context, self.history)
+                ai_response = await chat.send(transcript)
+                self.history = chat.history
             
-            # Convert response to speech
-            synthesis_input = texttospeech.SynthesisInput(text=ai_response.text)
-            voice = texttospeech.VoiceSelectionParams(
-                language_code="fr-FR",
-                name="fr-FR-Wavenet-C",
-            )
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-                speaking_rate=1.0,
-            )
-
-            response = await self.tts_client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+            # Convert response to speech; shares the pipeline's cache key, so
+            # fixed phrases (greetings, confirmations) hit what was prewarmed
+            pipeline = VoicePipeline(self.clients, self.context, self.history, tts_cache=tts_cache)
+            audio = await pipeline.synthesize(ai_response.text)
 
             return {
                 'transcript': transcript,
                 'response': ai_response.text,
-                'audio': base64.b64encode(response.audio_content).decode('utf-8')
+                'audio': audio
             }
         except Exception as e:
             logging.error(f"Voice processing error: {e}")
             return None
 
+async def send_control(event: dict):
+    """orjson text frame; binary frames are reserved for audio"""
+    await websocket.send(orjson.dumps(event).decode())
+
+async def send_voice_event(event: dict, binary: bool, seq: int, final: bool = False) -> int:
+    """Send one pipeline/process_voice result, returning the next outbound seq"""
+    if 'audio' not in event:
+        await send_control(event)
+        return seq
+    if not binary:
+        await websocket.send_json({**event, 'audio': base64.b64encode(event['audio']).decode('utf-8')})
+        return seq
+    await send_control({**{k: v for k, v in event.items() if k != 'audio'}, 'frame_seq': seq})
+    await websocket.send(encode_frame(pcm_payload(event['audio']), seq, FORMAT_S16, final))
+    return seq + 1
+
 @app.websocket('/voice-chat')
 async def voice_chat():
     session = None
     try:
         config = WebSocketConfig(**request.args)
+        binary = config.protocol == "binary"
         session = VoiceChatSession()
+        out_seq = 0
         while True:
-            data = await websocket.receive_json()
-            audio_data = np.array(data['audio'], dtype=np.float32).tobytes()
-            
+            message = await websocket.receive()
+            try:
+                if isinstance(message, bytes):
+                    frame = decode_frame(message)
+                    session.buffer_audio(frame.samples)
+                    final = frame.final
+                else:
+                    data = orjson.loads(message)
+                    if 'audio' in data:
+                        session.buffer_audio(np.array(data['audio'], dtype=np.float32))
+                    # Clients may stream one utterance over several messages
+                    final = data.get('final', True)
+            except BufferOverflowError:
+                session.take_buffered_audio()
+                await send_control({"error": "Audio buffer full"})
+                continue
+            except (FrameError, orjson.JSONDecodeError) as e:
+                await send_control({"error": "Malformed message", "details": str(e)})
+                continue
+
+            if not final:
+                continue
+            audio_data = session.take_buffered_audio()
+
+            if config.mode == "pipelined":
+                async for event in session.process_voice_stream(audio_data):
+                    out_seq = await send_voice_event(event, binary, out_seq)
+                continue
+
             result = await session.process_voice(audio_data)
             if result:
-                await websocket.send_json(result)
+                out_seq = await send_voice_event(result, binary, out_seq, final=True)
     except ValidationError as e:
         await websocket.send_json({"error": "Invalid configuration", "details": str(e)})
         return
@@ -380,11 +468,21 @@ async def onboarding_chat():
         data = await request.get_json()
         chat_request = ChatRequest(**data)
         
-        if not await rate_limiter.is_allowed(request.remote_addr, request.scope):
+        if not (await check_rate_limit()).allowed:
             return jsonify({"error": "Rate limit exceeded"}), 429
             
-        response = await model.chat(chat_request.history)
-        return jsonify({"reply": response.text})
+        async def generate() -> str:
+            response = await model.generate_content_async(chat_request.history)
+            text = response.text
+            # Never cache an empty reply under a shared key
+            if not text.strip():
+                raise ValueError("Gemini returned an empty reply")
+            return text
+
+        reply = await onboarding_cache.reply(
+            chat_request.business_id, chat_request.history, chat_request.persona, generate
+        )
+        return jsonify({"reply": reply})
     except ValidationError as e:
         logging.warning(f"Validation error: {e}")
         return jsonify({"error": "Invalid request format", "details": e.errors()}), 400
@@ -399,10 +497,47 @@ async def health_check():
         "status": "healthy",
         "redis": await redis.ping(),
         "firebase": db is not None,
-        "gemini": model is not None
+        "gemini": model is not None,
+        "client_pools": pools.stats(),
+        "event_loop_lag": loop_lag_monitor.stats(),
+        "executors": executor_stats(),
+        "dsp_worker": dsp_worker.stats(),
+        "message_bus": message_bus.get_stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "onboarding_cache": onboarding_cache.stats(),
+        "tts_cache": tts_cache.stats(),
+        "ip_blocklist": ip_blocklist.stats(),
+        "connection_lifecycle": connection_lifecycle.stats(),
+        "websockets": ws_manager.stats(),
+        "outbound_http": outbound.stats()
     }
     return jsonify(status)
 
+@app.route("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.websocket("/metrics/<business_id>")
+async def metrics_stream(business_id):
+    """Joins the dashboard to its business's group; publish_metrics does the sending"""
+    connection = await ws_manager.register(uuid.uuid4().hex, websocket._get_current_object())
+    ws_manager.add_to_group(connection.id, f"{METRICS_GROUP_PREFIX}{business_id}")
+    try:
+        await ws_manager.send_to_connection(connection.id, metrics.snapshot())
+        while True:
+            await websocket.receive()
+            connection.touch()
+    finally:
+        await ws_manager.unregister(connection.id)
+
+async def publish_metrics():
+    """One snapshot per interval, serialized once for every connected dashboard"""
+    while True:
+        await asyncio.sleep(settings.METRICS_STREAM_INTERVAL)
+        groups = [group for group in ws_manager.groups if group.startswith(METRICS_GROUP_PREFIX)]
+        if groups:
+            await ws_manager.broadcast_groups(groups, metrics.snapshot())
+
 @app.route("/health/live")
 async def liveness():
     return jsonify({"status": "alive"})
@@ -425,41 +560,48 @@ async def readiness():
 # Use uvloop for better async performance
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
-# Connection pools
-http_client = httpx.AsyncClient(
-    limits=httpx.Limits(
-        max_keepalive_connections=settings.HTTP_POOL_SIZE,
-        max_connections=settings.HTTP_POOL_SIZE
-    ),
-    timeout=30.0
-)
-
-# Thread pool for CPU-bound tasks
-thread_pool = ThreadPoolExecutor(
-    max_workers=settings.MAX_WORKERS,
-    thread_name_prefix="worker"
-)
-
 @asynccontextmanager
 async def get_session():
-    try:
-        yield http_client
-    finally:
-        pass  # Connection handled by pool
+    yield outbound  # Connections are pooled by the shared client
 
 app.json_encoder = orjson.dumps  # Faster JSON serialization
 app.json_decoder = orjson.loads  # Faster JSON deserialization
 
+async def prewarm_tts_cache():
+    """Synthesize each business's fixed phrases ahead of its first call"""
+    phrases = await run_io(load_prewarm_phrases, settings.TTS_PREWARM_FILE)
+    pipeline = VoicePipeline(pools, context="", history=[], tts_cache=tts_cache)
+    for business_id, business_phrases in phrases.items():
+        warmed = await tts_cache.prewarm(business_phrases, pipeline.synthesize)
+        logging.info(f"Prewarmed {warmed}/{len(business_phrases)} TTS phrases for {business_id}")
+
 # Cleanup
 @app.before_serving
 async def startup():
     # Initialize connections
-    pass
+    metrics.register_routes(rule.rule for rule in app.url_map.iter_rules())
+    loop_lag_monitor.start()
+    await ws_manager.start()
+    await cache_manager.start()
+    global metrics_publisher
+    metrics_publisher = asyncio.create_task(publish_metrics())
+    await pools.start()
+    ip_blocklist.start()
+    app.add_background_task(prewarm_tts_cache)
 
 @app.after_serving
 async def shutdown():
-    await http_client.aclose()
-    thread_pool.shutdown(wait=True)
+    if metrics_publisher:
+        metrics_publisher.cancel()
+    await pools.close()
+    await cache_manager.close()
+    await dsp_worker.close()
+    await message_bus.close()
+    await ip_blocklist.close()
+    await connection_lifecycle.close()
+    await loop_lag_monitor.stop()
+    await outbound.aclose()
+    shutdown_executors(wait=True)
 
 if __name__ == '__main__':
     port = int(settings.PORT)
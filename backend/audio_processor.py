@@ -1,13 +1,21 @@
 from functools import lru_cache
+from dataclasses import dataclass
 import numpy as np
 from scipy import signal
-import wave
-import io
 import logging
-from typing import Optional
+from typing import List, Optional
+from utils.ring_buffer import AudioRingBuffer
+from utils.dsp_worker import polyphase_filter
+from utils.executors import run_cpu_array
+
+def peak_normalize(audio: np.ndarray) -> np.ndarray:
+    peak = int(np.abs(audio.astype(np.int32)).max()) or 1  # Avoid division by zero
+    normalized = np.empty_like(audio)
+    np.multiply(audio, 32767 / peak, out=normalized, casting='unsafe')
+    return normalized
+
 
 class AudioProcessor:
-    CHUNK_SIZE = 1024 * 16  # 16KB chunks
     DTYPE = np.float32  # Specify dtype for better performance
 
     @staticmethod
@@ -18,39 +26,262 @@ class AudioProcessor:
 
     @classmethod
     def normalize_audio(cls, audio_data: bytes, target_sample_rate: int = 16000) -> bytes:
+        """Peak-normalize 16-bit PCM into one contiguous buffer (no container)"""
         try:
-            # Process in chunks to reduce memory usage
-            chunks = []
-            for i in range(0, len(audio_data), cls.CHUNK_SIZE):
-                chunk = audio_data[i:i + cls.CHUNK_SIZE]
-                # Process chunk
-                chunks.append(cls._process_chunk(chunk, target_sample_rate))
-            
-            return b''.join(chunks)
+            audio = np.frombuffer(audio_data, dtype=np.int16)
+            if audio.size == 0:
+                return b''
+            return peak_normalize(audio).tobytes()
         except Exception as e:
             logging.error(f"Audio normalization error: {e}")
             raise
 
     @classmethod
-    def _process_chunk(cls, chunk: bytes, target_sample_rate: int) -> bytes:
-        # Use vectorized operations
-        audio = np.frombuffer(chunk, dtype=np.int16).astype(cls.DTYPE)
-        max_val = np.abs(audio).max() or 1  # Avoid division by zero
-        audio = (audio / max_val * 32767).astype(np.int16)
-        
-        # Pre-allocate buffer
-        buffer = io.BytesIO()
-        with wave.open(buffer, 'wb') as wav:
-            wav.setnchannels(1)
-            wav.setsampwidth(2)
-            wav.setframerate(target_sample_rate)
-            wav.writeframes(audio.tobytes())
-            
-        return buffer.getvalue()
+    async def normalize_audio_async(cls, audio_data: bytes, target_sample_rate: int = 16000) -> bytes:
+        """normalize_audio on the CPU process pool, off the event loop"""
+        try:
+            audio = np.frombuffer(audio_data, dtype=np.int16)
+            if audio.size == 0:
+                return b''
+            return (await run_cpu_array(peak_normalize, audio)).tobytes()
+        except Exception as e:
+            logging.error(f"Audio normalization error: {e}")
+            raise
 
     @staticmethod
-    def detect_speech(audio_data: bytes, threshold: float = 0.1) -> bool:
-        audio = np.frombuffer(audio_data, dtype=np.int16)
-        audio = audio / 32768.0  # Normalize to [-1, 1]
-        rms = np.sqrt(np.mean(np.square(audio)))
-        return rms > threshold
+    def detect_speech(audio_data: bytes, sample_rate: int = 16000) -> bool:
+        """One-shot check; streaming callers should keep a VoiceActivityDetector"""
+        vad = VoiceActivityDetector(sample_rate=sample_rate)
+        return bool(vad.process(audio_data)) or vad.in_speech
+
+
+@dataclass
+class VADEvent:
+    type: str  # 'speech_start' or 'speech_end'
+    timestamp: float  # seconds since the start of the stream
+    audio: Optional[bytes] = None  # voiced segment, only set on speech_end
+
+
+class VoiceActivityDetector:
+    """Incremental energy + zero-crossing endpointer over 16-bit mono PCM.
+
+    Audio is consumed in fixed frames (20 ms by default). A frame counts as
+    voiced when its energy clears an adaptive noise floor by ``energy_ratio``
+    and its zero-crossing rate is speech-like. Speech starts after
+    ``start_ms`` of voiced frames and ends after ``endpoint_ms`` of silence;
+    the emitted segment keeps ``pre_roll_ms`` before the onset and
+    ``hangover_ms`` after the last voiced frame.
+
+    The floor follows drops at once and rises at ``noise_adapt_rate`` on
+    unvoiced frames. Inside a segment it keeps rising at the much slower
+    ``speech_adapt_rate``: pauses between words pull it back down, but a
+    steady noise that started mid-stream is absorbed within a few seconds
+    instead of being endpointed as one long utterance after another.
+    """
+
+    SPEECH_START = 'speech_start'
+    SPEECH_END = 'speech_end'
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20,
+                 energy_ratio: float = 3.0, min_energy: float = 1e-5,
+                 max_zcr: float = 0.35, start_ms: int = 60,
+                 hangover_ms: int = 240, endpoint_ms: int = 600,
+                 pre_roll_ms: int = 200, max_segment_ms: int = 15000,
+                 noise_adapt_rate: float = 0.05, speech_adapt_rate: float = 0.002):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.frame_seconds = frame_ms / 1000
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.max_zcr = max_zcr
+        self.noise_adapt_rate = noise_adapt_rate
+        self.speech_adapt_rate = speech_adapt_rate
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = hangover_ms // frame_ms
+        self.endpoint_frames = max(1, endpoint_ms // frame_ms)
+        self.max_segment_frames = max_segment_ms // frame_ms
+        # Both rings are allocated once per stream and reused across utterances
+        self._pre_roll = AudioRingBuffer(capacity=max(1, pre_roll_ms // frame_ms) * self.frame_bytes)
+        self._segment = AudioRingBuffer(capacity=self.max_segment_frames * self.frame_bytes)
+        self.reset()
+
+    def reset(self):
+        self._remainder = b''
+        self._frame_index = 0
+        self._noise_floor: Optional[float] = None
+        self._voiced_run = 0
+        self._silence_run = 0
+        self._segment.clear()
+        self._last_voiced = -1
+        self._speech_started_at = 0.0
+        self._pre_roll.clear()
+        self.in_speech = False
+
+    @property
+    def noise_floor(self) -> Optional[float]:
+        return self._noise_floor
+
+    def _frame_features(self, frames: np.ndarray):
+        samples = frames.astype(np.float32) / 32768.0
+        energy = np.mean(np.square(samples), axis=1)
+        crossings = np.count_nonzero(np.diff(np.signbit(samples), axis=1), axis=1)
+        zcr = crossings / self.frame_samples
+        return energy, zcr
+
+    def _update_noise_floor(self, energy: float, rate: float):
+        if self._noise_floor is None:
+            self._noise_floor = max(energy, self.min_energy)
+        elif energy < self._noise_floor:
+            # Track drops in background level quickly, rises slowly
+            self._noise_floor = max(energy, self.min_energy)
+        else:
+            self._noise_floor += rate * (energy - self._noise_floor)
+
+    def _is_voiced(self, energy: float, zcr: float) -> bool:
+        if self._noise_floor is None:
+            return False
+        threshold = max(self._noise_floor * self.energy_ratio, self.min_energy)
+        return energy > threshold and zcr < self.max_zcr
+
+    def _segment_frames(self) -> int:
+        return len(self._segment) // self.frame_bytes
+
+    def _end_segment(self) -> VADEvent:
+        keep = min(self._segment_frames(), self._last_voiced + 1 + self.hangover_frames)
+        audio = self._segment.read(keep * self.frame_bytes)
+        end_time = self._speech_started_at + keep * self.frame_seconds
+        self._segment.clear()
+        self._last_voiced = -1
+        self._silence_run = 0
+        self._voiced_run = 0
+        self.in_speech = False
+        return VADEvent(self.SPEECH_END, end_time, audio)
+
+    def process(self, audio_data: bytes) -> List[VADEvent]:
+        """Feed PCM bytes of any length; returns events completed by this chunk"""
+        data = self._remainder + audio_data
+        n_frames = len(data) // self.frame_bytes
+        self._remainder = data[n_frames * self.frame_bytes:]
+        if n_frames == 0:
+            return []
+
+        view = memoryview(data)
+        frames = np.frombuffer(data, dtype=np.int16, count=n_frames * self.frame_samples)
+        energies, zcrs = self._frame_features(frames.reshape(n_frames, self.frame_samples))
+
+        events = []
+        for i in range(n_frames):
+            frame = view[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            energy = float(energies[i])
+            voiced = self._is_voiced(energy, float(zcrs[i]))
+            timestamp = self._frame_index * self.frame_seconds
+            self._frame_index += 1
+
+            if not self.in_speech:
+                if voiced:
+                    self._voiced_run += 1
+                else:
+                    self._voiced_run = 0
+                    self._update_noise_floor(energy, self.noise_adapt_rate)
+                self._pre_roll.write(frame)
+
+                if self._voiced_run >= self.start_frames:
+                    self.in_speech = True
+                    self._segment.clear()
+                    for part in self._pre_roll.views():
+                        self._segment.write(part)
+                    self._pre_roll.clear()
+                    self._last_voiced = self._segment_frames() - 1
+                    onset = timestamp - (self.start_frames - 1) * self.frame_seconds
+                    self._speech_started_at = timestamp - self._last_voiced * self.frame_seconds
+                    events.append(VADEvent(self.SPEECH_START, max(onset, 0.0)))
+                continue
+
+            self._segment.write(frame)
+            self._update_noise_floor(energy, self.speech_adapt_rate)
+            if voiced:
+                self._last_voiced = self._segment_frames() - 1
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+
+            if (self._silence_run >= self.endpoint_frames or
+                    self._segment_frames() >= self.max_segment_frames):
+                events.append(self._end_segment())
+
+        return events
+
+    def flush(self) -> List[VADEvent]:
+        """Close any open segment, e.g. when the stream ends"""
+        self._remainder = b''
+        if self.in_speech and len(self._segment):
+            return [self._end_segment()]
+        return []
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    """G.711 mu-law byte -> 16-bit linear PCM"""
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    table = np.where(codes & 0x80, -magnitude, magnitude)
+    return table.astype(np.int16)
+
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    """16-bit linear PCM (indexed by its uint16 bit pattern) -> G.711 mu-law byte"""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), 8159) + 0x21
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    code = np.where(segment > 7, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+
+
+def ulaw_decode(data: bytes) -> np.ndarray:
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def ulaw_encode(pcm: np.ndarray) -> bytes:
+    return ULAW_ENCODE_TABLE[np.ascontiguousarray(pcm, dtype=np.int16).view(np.uint16)].tobytes()
+
+
+class PolyphaseResampler:
+    """Stateful rational resampler for streamed audio.
+
+    Unlike ``resample_poly`` on each chunk, filter state carries across calls
+    so 20 ms frames join without edge clicks. Filter taps come from the shared
+    ``polyphase_filter`` cache.
+    """
+
+    def __init__(self, from_rate: int, to_rate: int):
+        g = np.gcd(from_rate, to_rate)
+        self.up = to_rate // g
+        self.down = from_rate // g
+        taps = polyphase_filter(self.up, self.down) * self.up
+        self._phases = [taps[p::self.up] for p in range(self.up)]
+        self._state = [np.zeros(len(phase) - 1) for phase in self._phases]
+        self._skip = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.up == 1 and self.down == 1:
+            return samples.astype(np.float32)
+
+        upsampled = np.empty((len(samples), self.up))
+        for p, phase in enumerate(self._phases):
+            upsampled[:, p], self._state[p] = signal.lfilter(phase, 1.0, samples, zi=self._state[p])
+        upsampled = upsampled.reshape(-1)
+
+        out = upsampled[self._skip::self.down]
+        self._skip = (self._skip - len(upsampled)) % self.down
+        return out.astype(np.float32)
+
+    def process_pcm16(self, samples: np.ndarray) -> np.ndarray:
+        out = self.process(samples)
+        return np.clip(out, -32768, 32767, out=out).astype(np.int16)
@@ -0,0 +1,86 @@
+"""Redis Streams message bus against a real redis-server.
+
+Two ``RedisStreamQueue`` instances stand in for two workers on a throwaway
+topic. Checks that fan-out subscribers each see every event, that a shared
+group handles each event once, and that the startup sweep removes a group
+left behind by a dead worker while keeping the live ones; reports
+end-to-end throughput. The stream is deleted afterwards.
+
+    cd backend && REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_redis_queue
+"""
+import asyncio
+import logging
+import time
+import uuid
+
+from utils.redis_queue import RedisStreamQueue
+
+EVENTS = 5000
+SWEEP_IDLE_MS = 2500  # longer than a live consumer's 1 s blocking read
+DEAD_GROUP = "fanout:dead-host:1:0"
+
+
+def counter(counts, index):
+    async def handler(event):
+        counts[index] += 1
+    return handler
+
+
+async def wait_until(predicate, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("events were not all delivered")
+        await asyncio.sleep(0.01)
+
+
+async def group_names(redis, stream):
+    return {info['name'].decode() if isinstance(info['name'], bytes) else info['name']
+            for info in await redis.xinfo_groups(stream)}
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    topic = f"bench_{uuid.uuid4().hex[:8]}"
+    workers = [RedisStreamQueue(topics=[topic]) for _ in range(2)]
+    for index, worker in enumerate(workers):
+        worker.consumer = f"{worker.consumer}:{index}"  # distinct workers within one process
+        await worker.create_queue(topic, maxsize=EVENTS * 2)  # no trimming mid-run
+    redis = workers[0].redis
+    stream = workers[0]._stream(topic)
+
+    try:
+        fanout, shared = [0, 0], [0, 0]
+        for index, worker in enumerate(workers):
+            await worker.subscribe(topic, counter(fanout, index))
+            await worker.subscribe(topic, counter(shared, index), group="bench")
+
+        start = time.perf_counter()
+        for n in range(EVENTS):
+            await workers[n % 2].publish(topic, {"n": n})
+        await wait_until(lambda: fanout == [EVENTS, EVENTS] and sum(shared) == EVENTS)
+        elapsed = time.perf_counter() - start
+        print(f"fan-out  {fanout} of {EVENTS} each")
+        print(f"shared   {shared} (sum {sum(shared)})")
+        print(f"{EVENTS / elapsed:,.0f} events/s published and delivered to 3 groups")
+
+        # What a crashed worker leaves: a private group with entries pending
+        await redis.xgroup_create(stream, DEAD_GROUP, id="0")
+        await redis.xreadgroup(DEAD_GROUP, "dead-host:1", {stream: ">"}, count=10)
+        await asyncio.sleep(SWEEP_IDLE_MS / 1000 + 0.5)
+        before = await group_names(redis, stream)
+        destroyed = await workers[1].sweep_stale_groups(stream, max_idle_ms=SWEEP_IDLE_MS)
+        after = await group_names(redis, stream)
+        assert DEAD_GROUP in before and DEAD_GROUP not in after, after
+        assert after == before - {DEAD_GROUP}, f"live groups swept: {before - after}"
+        print(f"sweep    destroyed {destroyed} stale group, kept {len(after)} live ones")
+    finally:
+        for worker in workers:
+            await worker.close(drain_timeout=1.0)
+        cleanup = RedisStreamQueue(topics=[])
+        await cleanup.redis.delete(stream)
+        await cleanup.redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
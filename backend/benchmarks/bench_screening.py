@@ -0,0 +1,85 @@
+"""Per-request cost of SecurityMiddleware screening.
+
+Compares searching each pattern separately (what a straightforward loop
+over ``SUSPICIOUS_PATTERNS`` costs) with the merged regex, and times the
+whole middleware in front of a no-op endpoint. Nothing here touches Redis:
+the benchmark clients never reach the block threshold.
+
+    cd backend && python -m benchmarks.bench_screening
+"""
+import asyncio
+import logging
+import re
+import time
+from urllib.parse import unquote_plus
+
+from middleware import SecurityMiddleware
+from utils.request_screening import SUSPICIOUS_PATTERNS, RequestScreener
+
+ITERATIONS = 100_000
+ROUNDS = 7
+
+REQUESTS = {
+    "clean": ("/api/onboarding-chat", b"business_id=b-1042&lang=fr-FR"),
+    "suspicious path": ("/static/../../etc/passwd", b""),
+    "suspicious query": ("/api/search", b"q=1%20UNION%20SELECT%20FROM%20users"),
+}
+
+
+def per_pattern(patterns):
+    compiled = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+    def screen(path, query_string=b''):
+        query = unquote_plus(query_string.decode('latin-1'))
+        for regex in compiled:
+            if regex.search(path) or regex.search(query):
+                return True
+        return False
+    return screen
+
+
+def best_of(func, *args) -> float:
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / ITERATIONS * 1e9
+
+
+async def endpoint(scope, receive, send):
+    pass
+
+
+async def middleware_cost(path: str, query_string: bytes) -> float:
+    security = SecurityMiddleware(endpoint, threshold=float('inf'))
+    scopes = [{"type": "http", "method": "GET", "path": path, "query_string": query_string,
+               "headers": [], "client": (f"10.{i % 200}.{i % 251}.{i % 97}", 4000)}
+              for i in range(ITERATIONS)]
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for scope in scopes:
+            await security(scope, None, _discard)
+        best = min(best, time.perf_counter() - start)
+    return best / ITERATIONS * 1e9
+
+
+async def _discard(message):
+    pass
+
+
+async def main():
+    logging.disable(logging.WARNING)  # rejections log; formatting them is not screening cost
+    loop_screen = per_pattern(SUSPICIOUS_PATTERNS)
+    merged_screen = RequestScreener().screen
+    print(f"{'request':<18} {'per pattern':>12} {'merged':>9} {'middleware':>11}  (ns/request)")
+    for name, (path, query_string) in REQUESTS.items():
+        print(f"{name:<18} {best_of(loop_screen, path, query_string):12.0f} "
+              f"{best_of(merged_screen, path, query_string):9.0f} "
+              f"{await middleware_cost(path, query_string):11.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
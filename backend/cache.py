@@ -1,43 +1,313 @@
-import aioredis
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from functools import wraps
-import json
-from typing import Optional, Callable, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
 import orjson
+from redis import asyncio as aioredis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TAG_PREFIX = "tag:"
+
+
+def business_tag(business_id: str) -> str:
+    return f"business:{business_id}"
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'refresh_at')
+
+    def __init__(self, value: Any, size: int, expires_at: float, refresh_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.refresh_at = refresh_at
+
+
+@dataclass
+class CacheStats:
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            'l1_hits': self.l1_hits,
+            'l2_hits': self.l2_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'errors': self.errors,
+            'hit_ratio': round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LocalCache:
+    """In-process LRU bounded by entry count and serialized size, with per-entry TTL"""
+
+    def __init__(self, max_entries: int = settings.CACHE_L1_MAX_ENTRIES,
+                 max_bytes: int = settings.CACHE_L1_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.size_bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = entry
+        self.size_bytes += entry.size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= evicted.size
+            self.evictions += 1
+
+    def pop(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry.size
+        return entry
+
+    def pop_matching(self, pattern: str) -> int:
+        matched = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in matched:
+            self.pop(key)
+        return len(matched)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
 
 class RedisCache:
-    def __init__(self, redis_url: str, pool_size: int = 20):
-        self.redis = aioredis.from_url(
-            redis_url,
-            encoding='utf-8',
-            decode_responses=True,
-            max_connections=pool_size
-        )
+    """Two-tier cache: a bounded in-process L1 in front of Redis (L2).
+
+    Values are stored as orjson bytes. Concurrent misses for one key share a
+    single load, and a hit past the refresh-ahead point of its TTL returns
+    the cached value while one background load replaces it, so a hot key
+    never expires under load.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL,
+                 pool_size: int = settings.REDIS_POOL_SIZE,
+                 l1: Optional[LocalCache] = None,
+                 l1_ttl: float = settings.CACHE_L1_TTL,
+                 refresh_ahead: float = settings.CACHE_REFRESH_AHEAD):
+        self.redis = aioredis.from_url(redis_url, max_connections=pool_size)
+        self.l1 = l1 or LocalCache()
+        self.l1_ttl = l1_ttl
+        self.refresh_ahead = refresh_ahead
         self._serialize = orjson.dumps
         self._deserialize = orjson.loads
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, CacheStats] = {}
+
+    @staticmethod
+    def make_key(prefix: str, *args, **kwargs) -> str:
+        raw = orjson.dumps([args, kwargs], default=str,
+                           option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        return f"{prefix}:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+    def _entry(self, value: Any, size: int, ttl: float, now: float) -> CacheEntry:
+        return CacheEntry(value, size,
+                          expires_at=now + min(ttl, self.l1_ttl),
+                          refresh_at=now + ttl * self.refresh_ahead)
+
+    def _prefix_stats(self, prefix: str) -> CacheStats:
+        stats = self._stats.get(prefix)
+        if stats is None:
+            stats = self._stats[prefix] = CacheStats()
+        return stats
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        entry = self.l1.get(key, now)
+        if entry is not None:
+            return entry.value
+        raw = await self.redis.get(key)
+        return self._deserialize(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, expire: int = settings.CACHE_TTL,
+                  tags: Sequence[str] = ()):
+        raw = self._serialize(value)
+        await self._write(key, raw, expire, tags)
+        self.l1.put(key, self._entry(value, len(raw), expire, time.monotonic()))
+
+    async def _write(self, key: str, raw: bytes, expire: int, tags: Sequence[str]):
+        if not tags:
+            await self.redis.set(key, raw, ex=expire)
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, raw, ex=expire)
+            for tag in tags:
+                # Tag sets outlive their members; stale members are harmless to UNLINK
+                pipe.sadd(TAG_PREFIX + tag, key)
+                pipe.expire(TAG_PREFIX + tag, max(expire, settings.CACHE_TTL))
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        self.invalidate_local(*keys)
+        if keys:
+            await self.redis.unlink(*keys)
+
+    def invalidate_local(self, *keys: str):
+        for key in keys:
+            self.l1.pop(key)
 
-    async def get(self, key: str) -> Optional[str]:
-        return await self.redis.get(key)
+    async def delete_tags(self, *tags: str) -> List[str]:
+        """Delete every key registered under ``tags`` along with the tag sets"""
+        deleted: List[str] = []
+        for tag in tags:
+            tag_key = TAG_PREFIX + tag
+            batch: list = []
+            async for key in self.redis.sscan_iter(tag_key, count=settings.CACHE_SCAN_COUNT):
+                batch.append(key)
+                if len(batch) >= settings.CACHE_SCAN_COUNT:
+                    deleted.extend(await self._unlink_batch(batch))
+                    batch = []
+            batch.append(tag_key)
+            deleted.extend(await self._unlink_batch(batch))
+        return [key for key in deleted if not key.startswith(TAG_PREFIX)]
 
-    async def set(self, key: str, value: str, expire: int = 3600):
-        await self.redis.set(key, value, ex=expire)
+    async def delete_matching(self, pattern: str) -> int:
+        """Incremental SCAN + UNLINK so no single call blocks Redis on the whole keyspace"""
+        deleted = 0
+        batch: list = []
+        async for key in self.redis.scan_iter(match=pattern, count=settings.CACHE_SCAN_COUNT):
+            batch.append(key)
+            if len(batch) >= settings.CACHE_SCAN_COUNT:
+                deleted += len(await self._unlink_batch(batch))
+                batch = []
+        if batch:
+            deleted += len(await self._unlink_batch(batch))
+        self.l1.pop_matching(pattern)
+        return deleted
+
+    async def _unlink_batch(self, keys: list) -> List[str]:
+        await self.redis.unlink(*keys)
+        decoded = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        self.invalidate_local(*decoded)
+        return decoded
 
     async def get_many(self, keys: list) -> dict:
         """Batch get operation"""
         values = await self.redis.mget(keys)
         return {k: self._deserialize(v) for k, v in zip(keys, values) if v is not None}
 
-    def cached(self, prefix: str, ttl: int = 3600):
+    async def get_or_load(self, prefix: str, key: str,
+                          loader: Callable[[], Awaitable[Any]], ttl: int = settings.CACHE_TTL,
+                          tags: Sequence[str] = ()) -> Any:
+        stats = self._prefix_stats(prefix)
+        now = time.monotonic()
+        entry = self.l1.get(key, now)
+        if entry is not None:
+            stats.l1_hits += 1
+            if now >= entry.refresh_at:
+                self._refresh(prefix, key, loader, ttl, tags)
+            return entry.value
+        return await self._single_flight(key, lambda: self._load(prefix, key, loader, ttl, tags))
+
+    def _single_flight(self, key: str, load: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the load other callers share
+        return asyncio.shield(task)
+
+    def _refresh(self, prefix: str, key: str, loader: Callable[[], Awaitable[Any]], ttl: int,
+                 tags: Sequence[str]):
+        if key in self._inflight:
+            return
+        self._prefix_stats(prefix).refreshes += 1
+        task = self._single_flight(key, lambda: self._compute(prefix, key, loader, ttl, tags))
+        task.add_done_callback(self._log_refresh_failure)
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Cache refresh failed: {task.exception()}")
+
+    async def _load(self, prefix: str, key: str,
+                    loader: Callable[[], Awaitable[Any]], ttl: int, tags: Sequence[str]) -> Any:
+        stats = self._prefix_stats(prefix)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                raw, remaining_ms = await pipe.get(key).pttl(key).execute()
+        except Exception as e:
+            stats.errors += 1
+            logger.warning(f"Cache L2 read failed for {key}: {e}")
+            raw = None
+
+        if raw is not None:
+            stats.l2_hits += 1
+            value = self._deserialize(raw)
+            now = time.monotonic()
+            remaining = remaining_ms / 1000 if remaining_ms and remaining_ms > 0 else ttl
+            entry = self._entry(value, len(raw), remaining, now)
+            # Refresh ahead is measured against the full TTL, not what is left of it
+            entry.refresh_at = now + remaining - ttl * (1 - self.refresh_ahead)
+            # Near the end of its TTL the next L1 hit triggers the refresh
+            self.l1.put(key, entry)
+            return value
+
+        stats.misses += 1
+        return await self._compute(prefix, key, loader, ttl, tags)
+
+    async def _compute(self, prefix: str, key: str,
+                       loader: Callable[[], Awaitable[Any]], ttl: int, tags: Sequence[str]) -> Any:
+        value = await loader()
+        raw = self._serialize(value)
+        self.l1.put(key, self._entry(value, len(raw), ttl, time.monotonic()))
+        try:
+            await self._write(key, raw, ttl, tags)
+        except Exception as e:
+            self._prefix_stats(prefix).errors += 1
+            logger.warning(f"Cache L2 write failed for {key}: {e}")
+        return value
+
+    def cached(self, prefix: str, ttl: int = settings.CACHE_TTL,
+               tags: Optional[Callable[..., Sequence[str]]] = None):
+        """``tags`` maps the call arguments to invalidation tags, e.g. ``business_tag``"""
         def decorator(f: Callable) -> Callable:
             @wraps(f)
             async def wrapper(*args, **kwargs) -> Any:
-                key = f"{prefix}:{json.dumps(args)}:{json.dumps(kwargs)}"
-                cached_value = await self.get(key)
-                
-                if cached_value:
-                    return json.loads(cached_value)
-                
-                result = await f(*args, **kwargs)
-                await self.set(key, json.dumps(result), ttl)
-                return result
+                key = self.make_key(prefix, *args, **kwargs)
+                entry_tags = tags(*args, **kwargs) if tags else ()
+                return await self.get_or_load(prefix, key, lambda: f(*args, **kwargs), ttl, entry_tags)
             return wrapper
         return decorator
+
+    def stats(self) -> dict:
+        return {
+            'l1_entries': len(self.l1),
+            'l1_bytes': self.l1.size_bytes,
+            'l1_evictions': self.l1.evictions,
+            'inflight': len(self._inflight),
+            'prefixes': {prefix: stats.as_dict() for prefix, stats in self._stats.items()},
+        }
@@ -13,6 +13,9 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60
+    RATE_LIMIT_LOCAL_KEYS: int = 10000  # keys tracked by the in-process pre-check
+    RATE_LIMIT_MAX_KEYS: int = 100000  # hard cap for utils.rate_limiter
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0  # seconds between batched usage events
     
     # Performance settings
     MAX_WORKERS: int = 4
@@ -20,6 +23,19 @@ class Settings(BaseSettings):
     WEBSOCKET_TIMEOUT: int = 60
     MAX_PAYLOAD_SIZE: int = 1024 * 1024 * 5  # 5MB
     CACHE_TTL: int = 3600
+    CACHE_L1_TTL: int = 60  # in-process copies are re-read from Redis at least this often
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_REFRESH_AHEAD: float = 0.8  # fraction of the TTL after which hits trigger a refresh
+    CACHE_SCAN_COUNT: int = 500  # keys per SCAN/SSCAN step and per UNLINK
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    ONBOARDING_CACHE_TTL: int = 86400  # 0 disables the onboarding reply cache
+    ONBOARDING_CACHE_MAX_TURNS: int = 6  # longer histories are never cached
+    ONBOARDING_CACHE_OPT_OUT: str = ""  # comma-separated business ids
+    TTS_CACHE_DIR: str = "/tmp/thalya-tts-cache"
+    TTS_CACHE_MAX_ENTRIES: int = 2048  # mapped payloads kept open in each worker
+    TTS_CACHE_MAX_DISK_BYTES: int = 1024 * 1024 * 1024  # 1GB
+    TTS_PREWARM_FILE: str = "tts_prewarm.json"  # {business_id: [phrase, ...]}
     SAMPLE_RATE: int = 16000  # Added sample rate
     
     # Performance tuning
@@ -28,18 +44,47 @@ class Settings(BaseSettings):
     HEALTH_CHECK_INTERVAL: int = 60
     CPU_THRESHOLD: int = 80
     MEMORY_THRESHOLD: int = 80
+    ADMISSION_SAMPLE_INTERVAL: float = 1.0  # seconds between CPU/memory/loop-lag samples
+    ADMISSION_SMOOTHING: float = 0.3  # EWMA weight of the newest sample
+    ADMISSION_LAG_THRESHOLD: float = 0.25  # smoothed event loop lag (s) above which connections wait
+    ADMISSION_BUSINESS_QUOTA: int = 0  # concurrent connections per business, 0 for no quota
+    ADMISSION_QUEUE_TIMEOUT: float = 0.0  # seconds a refused connection may wait, 0 to reject at once
+    ADMISSION_MAX_QUEUE: int = 100
     CONNECTION_WARN_THRESHOLD: float = 0.8
+    CONNECTION_TICK: float = 1.0  # resolution of heartbeats and idle timeouts
+    WEBSOCKET_PING_INTERVAL: float = 30.0
+    WEBSOCKET_SEND_QUEUE: int = 64  # outbound messages buffered per socket
+    WEBSOCKET_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # or "disconnect"
+    WEBSOCKET_SEND_CONCURRENCY: int = 256  # sends in flight per worker
+    WEBSOCKET_SEND_TIMEOUT: float = 5.0
+    CONNECTION_IDLE_TIMEOUT: int = 1800  # seconds without activity before ConnectionManager drops a client
+    METRICS_STREAM_INTERVAL: float = 2.0  # seconds between /metrics/<business_id> pushes
+    MIDDLEWARE_TIMING: bool = False  # per-layer histograms in /metrics
+
+    # Request screening
+    SECURITY_REQUEST_THRESHOLD: float = 1000  # decayed per-IP score that triggers a block
+    SECURITY_PATTERN_WEIGHT: float = 100  # score added by a request matching a suspicious pattern
+    SECURITY_DECAY_HALF_LIFE: float = 60.0  # seconds
+    SECURITY_MAX_TRACKED_IPS: int = 100000
+    SECURITY_BLOCK_TTL: int = 3600
+    SECURITY_BLOCKLIST_KEY: str = "security:blocked"
     
     # Connection pools
     DB_POOL_SIZE: int = 20
     REDIS_POOL_SIZE: int = 20
     HTTP_POOL_SIZE: int = 100
+    HTTP_RETRY_BUDGET_RATIO: float = 0.1  # retries allowed per outbound request, on average
+    HTTP_RETRY_BUDGET_MIN_PER_SEC: float = 1.0  # retries always allowed regardless of volume
+    HTTP_RETRY_BUDGET_MAX_TOKENS: float = 10.0
     MAX_CONNECTIONS: int = 100  # Added max connections
     
     # Connection pool settings
     POOL_CLEANUP_INTERVAL: int = 300  # 5 minutes
     POOL_MAX_AGE: int = 3600  # 1 hour
+    POOL_IDLE_TIMEOUT: int = 600  # idle resources above POOL_MIN_SIZE are closed after this
     POOL_MIN_SIZE: int = 5
+    POOL_ACQUIRE_TIMEOUT: float = 5.0
+    CLIENT_POOL_MAX_SIZE: int = 32
     BACKOFF_MAX_TRIES: int = 3
     BACKOFF_MAX_TIME: int = 30
     BACKOFF_FACTOR: int = 2
@@ -54,11 +99,17 @@ class Settings(BaseSettings):
     QUEUE_BATCH_SIZE: int = 100
     QUEUE_MAX_RETRIES: int = 3
     QUEUE_RETRY_DELAY: int = 5
+    MESSAGE_QUEUE_BACKEND: str = "memory"  # "memory" or "redis"
+    DISTRIBUTED_QUEUE_TOPICS: str = "cache_events,rate_limits"  # carried over Redis Streams
+    QUEUE_STREAM_PREFIX: str = "mq:"
+    QUEUE_CLAIM_IDLE_MS: int = 30000  # pending entries older than this are reclaimed
+    QUEUE_GROUP_IDLE_MS: int = 600000  # fanout groups/consumers idle this long belonged to dead workers
     
     # Enhanced Performance Tuning
     THREAD_POOL_SIZE: int = multiprocessing.cpu_count() * 2
     PROCESS_POOL_SIZE: int = max(2, multiprocessing.cpu_count() - 1)
     IO_POOL_SIZE: int = 100
+    CPU_OFFLOAD_MIN_BYTES: int = 32 * 1024  # smaller jobs run inline
     
     # Monitoring thresholds
     MEMORY_CRITICAL: int = 90
@@ -3,8 +3,12 @@ from functools import wraps, lru_cache
 from quart import request, current_app
 import logging
 from time import perf_counter
-from typing import Dict, Any
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Optional, Sequence, Tuple
 import orjson
+from config import settings
+from utils.performance_monitor import metrics
+from utils.request_screening import DecayingCounter, RequestScreener, SharedBlocklist, ip_blocklist
 
 def require_api_key():
     def decorator(f):
@@ -25,21 +29,51 @@ async def log_request_info(request):
     """)
 
 class SecurityMiddleware:
-    def __init__(self, app):
+    """Rejects blocked clients and requests matching ``suspicious_patterns``.
+
+    Each request adds to its client's decaying score, suspicious ones by
+    ``pattern_weight``; a client whose score passes ``threshold`` is added
+    to the shared blocklist and refused by every worker until it expires.
+    """
+    def __init__(self, app, blocklist: Optional[SharedBlocklist] = None,
+                 screener: Optional[RequestScreener] = None,
+                 threshold: float = settings.SECURITY_REQUEST_THRESHOLD,
+                 pattern_weight: float = settings.SECURITY_PATTERN_WEIGHT):
         self.app = app
-        self.blocked_ips = set()
-        self.request_logs = {}
-        self.suspicious_patterns = [
-            r'../','exec\(', 'eval\(', r'(?:union|select|insert|delete|drop)\s+(?:from|into|table)',
-        ]
+        self.blocklist = blocklist or ip_blocklist
+        self.screener = screener or RequestScreener()
+        self.request_logs = DecayingCounter()
+        self.threshold = threshold
+        self.pattern_weight = pattern_weight
+
+    @property
+    def suspicious_patterns(self):
+        return self.screener.patterns
 
     def is_suspicious(self, client_ip: str) -> bool:
-        return (
-            client_ip in self.blocked_ips or
-            self.request_logs.get(client_ip, 0) > 1000
-        )
+        return self.blocklist.is_blocked(client_ip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        client_ip = (scope.get("client") or ("", 0))[0]
+        if self.blocklist.is_blocked(client_ip):
+            return await self.reject_request(scope, send)
+
+        fragment = self.screener.screen(scope["path"], scope.get("query_string", b""))
+        score = self.request_logs.hit(client_ip, self.pattern_weight if fragment else 1.0)
+        if score > self.threshold:
+            self.request_logs.forget(client_ip)
+            self.blocklist.block_soon(client_ip)
+            return await self.reject_request(scope, send)
+        if fragment:
+            logging.warning(f"Rejected {client_ip} {scope['path']}: matched {fragment!r}")
+            return await self.reject_request(scope, send)
+        return await self.app(scope, receive, send)
 
-    async def reject_request(self, send):
+    async def reject_request(self, scope, send):
+        if scope["type"] == "websocket":
+            return await send({"type": "websocket.close", "code": 1008})
         await send({
             "type": "http.response.start",
             "status": 403,
@@ -51,6 +85,9 @@ class SecurityMiddleware:
         })
 
 class MonitoringMiddleware:
+    def __init__(self, app):
+        self.app = app
+
     async def __call__(self, scope, receive, send):
         start_time = time.time()
         await self.app(scope, receive, send)
@@ -62,29 +99,47 @@ class MonitoringMiddleware:
             logging.info(f"Request {method} {path} took {duration:.2f}s")
 
 class PerformanceMiddleware:
-    def __init__(self, app):
+    """Records per-route latency histograms, in-flight gauges and errors into
+    ``utils.performance_monitor.metrics``; websockets are timed per connection."""
+
+    def __init__(self, app, registry=None, slow_threshold: float = 1.0):
         self.app = app
-        self._requests: Dict[str, Any] = {}
-        
+        self.metrics = registry or metrics
+        self.slow_threshold = slow_threshold
+
     async def __call__(self, scope, receive, send):
-        if scope["type"] not in ("http", "websocket"):
+        kind = scope["type"]
+        if kind not in ("http", "websocket"):
             return await self.app(scope, receive, send)
-            
+
+        route = self.metrics.route(kind, scope["path"])
+        route.in_flight += 1
         start = perf_counter()
-        
-        # Track concurrent requests
-        path = scope.get("path", "unknown")
-        self._requests[path] = self._requests.get(path, 0) + 1
-        
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
         try:
-            return await self.app(scope, receive, send)
+            if kind == "http":
+                await self.app(scope, receive, send_wrapper)
+            else:
+                status = 200
+                await self.app(scope, receive, send)
+        except Exception:
+            status = 500
+            raise
         finally:
             duration = perf_counter() - start
-            self._requests[path] -= 1
-            
-            # Log slow requests
-            if duration > 1.0:  # 1 second threshold
-                logging.warning(f"Slow request: {path} took {duration:.2f}s")
+            route.in_flight -= 1
+            route.latency.observe(duration)
+            if status >= 500:
+                route.errors += 1
+            if kind == "http" and duration > self.slow_threshold:
+                logging.warning(f"Slow request: {scope['path']} took {duration:.2f}s")
 
 class CacheMiddleware:
     def __init__(self, app, max_size=1000):
@@ -106,13 +161,91 @@ class CacheMiddleware:
         if len(self._cache) >= self._max_size:
             self._cache.pop(next(iter(self._cache)))
 
+
+@dataclass(frozen=True)
+class Layer:
+    """One middleware in a compiled chain.
+
+    ``factory`` is called once with the inner app. Requests whose path is in
+    ``skip_paths``, starts with one of ``skip_prefixes`` or whose scope type
+    is in ``skip_types`` go straight to the inner app.
+    """
+    factory: Callable[[Any], Any]
+    skip_paths: FrozenSet[str] = frozenset()
+    skip_prefixes: Tuple[str, ...] = ()
+    skip_types: FrozenSet[str] = frozenset()
+
+    @property
+    def name(self) -> str:
+        return getattr(self.factory, '__name__', type(self.factory).__name__)
+
+
+class _SkipDispatch:
+    __slots__ = ('layer', 'inner', 'skip_paths', 'skip_prefixes', 'skip_types')
+
+    def __init__(self, layer, inner, spec: Layer):
+        self.layer = layer
+        self.inner = inner
+        self.skip_paths = spec.skip_paths
+        self.skip_prefixes = spec.skip_prefixes
+        self.skip_types = spec.skip_types
+
+    def __call__(self, scope, receive, send):
+        # Returns the coroutine of whichever app handles the scope, so the
+        # bypass adds no extra await frame
+        if scope["type"] in self.skip_types:
+            return self.inner(scope, receive, send)
+        path = scope.get("path", "")
+        if path in self.skip_paths or (self.skip_prefixes and path.startswith(self.skip_prefixes)):
+            return self.inner(scope, receive, send)
+        return self.layer(scope, receive, send)
+
+
+class _TimedLayer:
+    """Records time spent in a layer and everything inside it"""
+    __slots__ = ('app', 'histogram')
+
+    def __init__(self, app, histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.histogram.observe(perf_counter() - start)
+
+
+def compile_middleware(app, layers: Sequence[Layer], timed: bool = False, registry=None):
+    """Build the middleware stack once, outermost layer first.
+
+    The result is a single ASGI callable; nothing is instantiated per
+    request. Layers without skip rules are linked directly, so they cost
+    exactly what the middleware itself costs. With ``timed`` every layer
+    reports an inclusive duration histogram to the metrics registry; the
+    difference between adjacent layers is that layer's own cost.
+    """
+    registry = registry or metrics
+    handler = app
+    for spec in reversed(layers):
+        wrapped = spec.factory(handler)
+        if timed:
+            wrapped = _TimedLayer(wrapped, registry.middleware_layer(spec.name))
+        if spec.skip_paths or spec.skip_prefixes or spec.skip_types:
+            wrapped = _SkipDispatch(wrapped, handler, spec)
+        handler = wrapped
+    return handler
+
+
 class OptimizedMiddlewareChain:
+    """Compatibility wrapper: composes ``middlewares`` once instead of per request"""
     def __init__(self, app, middlewares):
         self.app = app
         self.middlewares = middlewares
-    
+        self._handler = compile_middleware(app, [
+            m if isinstance(m, Layer) else Layer(m) for m in middlewares
+        ])
+
     async def __call__(self, scope, receive, send):
-        handler = self.app
-        for middleware in reversed(self.middlewares):
-            handler = middleware(handler)
-        return await handler(scope, receive, send)
+        return await self._handler(scope, receive, send)
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from cache import RedisCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "onboarding"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    if 'parts' in message:
+        return " ".join(
+            part.get('text', '') if isinstance(part, dict) else str(part)
+            for part in message['parts']
+        )
+    return str(message.get('content', ''))
+
+
+def canonical_history(history: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Reduce a chat history to what affects the reply.
+
+    Roles are folded to user/model and text is NFKC-normalized, lowercased
+    and whitespace-collapsed, so answers that differ only in formatting
+    share a key.
+    """
+    canonical = []
+    for message in history:
+        role = 'user' if message.get('role') == 'user' else 'model'
+        text = unicodedata.normalize('NFKC', _message_text(message))
+        canonical.append((role, _WHITESPACE.sub(' ', text).strip().lower()))
+    return canonical
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class OnboardingReplyCache:
+    """Caches onboarding replies shared across businesses.
+
+    Only the opening of a conversation is cached: once the history grows
+    past ``max_turns`` it is specific to one business and goes straight to
+    the model. Businesses can opt out, in which case their histories are
+    never read from or written to the cache.
+    """
+
+    def __init__(self, cache: RedisCache, ttl: int = settings.ONBOARDING_CACHE_TTL,
+                 max_turns: int = settings.ONBOARDING_CACHE_MAX_TURNS,
+                 opt_out: Iterable[str] = (), sample_size: int = 1024):
+        self.cache = cache
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self._opt_out = set(opt_out)
+        self._saved_ms: deque = deque(maxlen=sample_size)
+        self._metrics = {'hits': 0, 'misses': 0, 'bypassed': 0}
+
+    def opt_out(self, business_id: str):
+        self._opt_out.add(business_id)
+
+    def opt_in(self, business_id: str):
+        self._opt_out.discard(business_id)
+
+    def is_cacheable(self, business_id: Optional[str], history: List[Dict[str, Any]]) -> bool:
+        return (
+            self.ttl > 0
+            and 0 < len(history) <= self.max_turns
+            and business_id not in self._opt_out
+        )
+
+    def make_key(self, history: List[Dict[str, Any]], persona: Dict[str, Any]) -> str:
+        raw = orjson.dumps(
+            {'history': canonical_history(history), 'persona': persona},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return f"{CACHE_PREFIX}:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+    async def reply(self, business_id: Optional[str], history: List[Dict[str, Any]],
+                    persona: Dict[str, Any], generate: Callable[[], Awaitable[str]]) -> str:
+        if not self.is_cacheable(business_id, history):
+            self._metrics['bypassed'] += 1
+            return await generate()
+
+        generated = False
+
+        async def load() -> Dict[str, Any]:
+            nonlocal generated
+            generated = True
+            started = time.perf_counter()
+            text = await generate()
+            return {'reply': text, 'generation_ms': (time.perf_counter() - started) * 1000}
+
+        started = time.perf_counter()
+        entry = await self.cache.get_or_load(
+            CACHE_PREFIX, self.make_key(history, persona), load, self.ttl
+        )
+        if generated:
+            self._metrics['misses'] += 1
+        else:
+            self._metrics['hits'] += 1
+            # Callers that joined an in-flight generation saved little or nothing
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._saved_ms.append(max(0.0, entry['generation_ms'] - elapsed_ms))
+        return entry['reply']
+
+    def stats(self) -> dict:
+        lookups = self._metrics['hits'] + self._metrics['misses']
+        saved = sorted(self._saved_ms)
+        return {
+            **self._metrics,
+            'hit_ratio': round(self._metrics['hits'] / lookups, 4) if lookups else 0.0,
+            'saved_p50_ms': round(_percentile(saved, 0.5), 1),
+            'saved_p99_ms': round(_percentile(saved, 0.99), 1),
+            'opted_out': len(self._opt_out),
+        }
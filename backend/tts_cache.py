@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+import orjson
+
+from config import settings
+from utils.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+AudioPayload = Union[bytes, mmap.mmap]
+_WHITESPACE = re.compile(r"\s+")
+
+
+def load_prewarm_phrases(path: str) -> Dict[str, List[str]]:
+    """Read ``{business_id: [phrase, ...]}`` from a JSON file; missing file means none"""
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized speech.
+
+    Keys hash the normalized text together with every synthesis parameter,
+    so a hit is byte-identical to what Google would return. Payloads live in
+    one file each under ``directory`` and are served through read-only
+    mmaps: the bytes sit in the OS page cache, shared by every worker
+    process on the box, and the in-memory LRU only holds handles.
+    """
+
+    def __init__(self, directory: str = settings.TTS_CACHE_DIR,
+                 max_entries: int = settings.TTS_CACHE_MAX_ENTRIES,
+                 max_disk_bytes: int = settings.TTS_CACHE_MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, AudioPayload]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._disk_bytes: Optional[int] = None
+        self._trimming = False
+        self._metrics = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'errors': 0}
+
+    @staticmethod
+    def key(text: str, voice_name: str, language_code: str, speaking_rate: float,
+            encoding: str, sample_rate: Optional[int] = None) -> str:
+        text = _WHITESPACE.sub(' ', text).strip()
+        raw = orjson.dumps([text, voice_name, language_code, speaking_rate, encoding, sample_rate])
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pcm")
+
+    def _remember(self, key: str, audio: AudioPayload):
+        self._memory[key] = audio
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            # Dropping the handle is enough; an mmap still referenced by a
+            # caller stays valid until that caller is done with it
+            self._memory.popitem(last=False)
+
+    def _open(self, key: str) -> Optional[mmap.mmap]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)  # mtime doubles as last-used time for disk eviction
+            return mapped
+        except FileNotFoundError:
+            return None
+
+    def _store(self, key: str, audio: bytes) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(audio)
+        # Atomic, so concurrent workers never map a half-written file
+        os.replace(tmp, path)
+        return len(audio)
+
+    def _scan_disk(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def _trim_disk(self) -> int:
+        """Delete least recently used payloads until the tier is under 90% of its cap"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    async def get(self, key: str) -> Optional[AudioPayload]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self._metrics['memory_hits'] += 1
+            return audio
+        audio = await run_io(self._open, key)
+        if audio is not None:
+            self._metrics['disk_hits'] += 1
+            self._remember(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        self._remember(key, audio)
+        try:
+            written = await run_io(self._store, key, audio)
+            # Swap the heap copy for a page-cache mapping of the file just written
+            mapped = await run_io(self._open, key)
+            if mapped is not None and key in self._memory:
+                self._memory[key] = mapped
+            if self._disk_bytes is None:
+                self._disk_bytes = await run_io(self._scan_disk)
+            else:
+                self._disk_bytes += written
+            if self._disk_bytes > self.max_disk_bytes and not self._trimming:
+                self._trimming = True
+                try:
+                    self._disk_bytes = await run_io(self._trim_disk)
+                finally:
+                    self._trimming = False
+        except OSError as e:
+            self._metrics['errors'] += 1
+            logger.warning(f"TTS cache write failed: {e}")
+
+    async def get_or_synthesize(self, key: str,
+                                synthesize: Callable[[], Awaitable[bytes]]) -> AudioPayload:
+        audio = await self.get(key)
+        if audio is not None:
+            return audio
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._metrics['misses'] += 1
+            task = asyncio.create_task(self._fill(key, synthesize))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One session cancelling its turn must not cancel a synthesis others wait on
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        audio = await synthesize()
+        if audio:
+            await self.put(key, audio)
+        return audio
+
+    async def prewarm(self, phrases: Iterable[str], synthesize: Callable[[str], Awaitable[Any]],
+                      concurrency: int = 4) -> int:
+        """Run ``synthesize`` (which must go through this cache) for every phrase"""
+        slots = asyncio.Semaphore(concurrency)
+        warmed = 0
+
+        async def warm(phrase: str):
+            nonlocal warmed
+            async with slots:
+                try:
+                    await synthesize(phrase)
+                    warmed += 1
+                except Exception as e:
+                    logger.warning(f"TTS prewarm failed for {phrase!r}: {e}")
+
+        await asyncio.gather(*(warm(phrase) for phrase in phrases))
+        return warmed
+
+    def stats(self) -> dict:
+        lookups = sum(self._metrics[name] for name in ('memory_hits', 'disk_hits', 'misses'))
+        hits = self._metrics['memory_hits'] + self._metrics['disk_hits']
+        return {
+            **self._metrics,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_bytes': self._disk_bytes,
+        }
+
+
+tts_cache = TTSCache()
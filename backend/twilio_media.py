@@ -0,0 +1,100 @@
+import binascii
+import logging
+from typing import Iterator, Optional, Union
+
+import numpy as np
+import orjson
+
+from audio_processor import PolyphaseResampler, ulaw_decode, ulaw_encode
+
+logger = logging.getLogger(__name__)
+
+TWILIO_SAMPLE_RATE = 8000
+TWILIO_FRAME_MS = 20
+
+
+def pcm_payload(audio: bytes) -> memoryview:
+    """Return the PCM samples of a WAV blob (as produced by Google TTS LINEAR16)
+    without copying; raw PCM is passed through unchanged."""
+    view = memoryview(audio)
+    if len(audio) < 12 or audio[:4] != b'RIFF' or audio[8:12] != b'WAVE':
+        return view
+
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4]
+        chunk_size = int.from_bytes(audio[offset + 4:offset + 8], 'little')
+        offset += 8
+        if chunk_id == b'data':
+            return view[offset:offset + chunk_size]
+        offset += chunk_size + (chunk_size & 1)
+    return view[len(audio):]
+
+
+class TwilioMediaStream:
+    """Codec state for one Twilio Media Streams websocket.
+
+    Inbound ``media`` events are decoded from 8 kHz mu-law straight to 16-bit
+    PCM at ``sample_rate``; outbound audio is resampled back to 8 kHz and
+    sent as 20 ms mu-law frames.
+    """
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+        self.stopped = False
+        self._inbound = PolyphaseResampler(TWILIO_SAMPLE_RATE, sample_rate)
+        self._outbound_rate: Optional[int] = None
+        self._outbound: Optional[PolyphaseResampler] = None
+
+    def handle_message(self, message: Union[str, bytes]) -> Optional[bytes]:
+        """Parse one websocket message; returns PCM for inbound media events"""
+        try:
+            event = orjson.loads(message)
+        except orjson.JSONDecodeError:
+            logger.warning("Ignoring malformed Twilio media message")
+            return None
+
+        kind = event.get('event')
+        if kind == 'media':
+            media = event.get('media') or {}
+            if media.get('track', 'inbound') != 'inbound':
+                return None
+            return self.decode_payload(media.get('payload', ''))
+        if kind == 'start':
+            start = event.get('start') or {}
+            self.stream_sid = event.get('streamSid') or start.get('streamSid')
+            self.call_sid = start.get('callSid')
+            encoding = (start.get('mediaFormat') or {}).get('encoding', 'audio/x-mulaw')
+            if encoding != 'audio/x-mulaw':
+                logger.warning(f"Unexpected Twilio media encoding: {encoding}")
+        elif kind == 'stop':
+            self.stopped = True
+        return None
+
+    def decode_payload(self, payload: str) -> Optional[bytes]:
+        if not payload:
+            return None
+        samples = ulaw_decode(binascii.a2b_base64(payload))
+        return self._inbound.process_pcm16(samples).tobytes()
+
+    def encode_outbound(self, audio: bytes, sample_rate: Optional[int] = None) -> Iterator[str]:
+        """Yield Twilio ``media`` messages for 16-bit PCM or WAV audio"""
+        sample_rate = sample_rate or self.sample_rate
+        if self._outbound_rate != sample_rate:
+            self._outbound = PolyphaseResampler(sample_rate, TWILIO_SAMPLE_RATE)
+            self._outbound_rate = sample_rate
+
+        pcm = pcm_payload(audio)
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        encoded = ulaw_encode(self._outbound.process_pcm16(samples))
+
+        frame_bytes = TWILIO_SAMPLE_RATE * TWILIO_FRAME_MS // 1000
+        for offset in range(0, len(encoded), frame_bytes):
+            frame = encoded[offset:offset + frame_bytes]
+            yield orjson.dumps({
+                'event': 'media',
+                'streamSid': self.stream_sid,
+                'media': {'payload': binascii.b2a_base64(frame, newline=False).decode('ascii')}
+            }).decode('utf-8')
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import psutil
+
+from config import settings
+from .performance_monitor import loop_lag_monitor
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceSampler:
+    """EWMA-smoothed CPU, memory and event-loop lag, sampled in the background.
+
+    Readers only ever see the cached averages, so checking load on a hot
+    path costs a few attribute reads rather than psutil calls.
+    """
+
+    def __init__(self, interval: float = settings.ADMISSION_SAMPLE_INTERVAL,
+                 smoothing: float = settings.ADMISSION_SMOOTHING):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.cpu = 0.0
+        self.memory = 0.0
+        self.loop_lag = 0.0
+        self.samples = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            psutil.cpu_percent(interval=None)  # the first reading only sets the baseline
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def add_listener(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample(psutil.cpu_percent(interval=None),
+                            psutil.virtual_memory().percent,
+                            loop_lag_monitor.last_lag)
+            except Exception as e:
+                logger.error(f"Resource sampling failed: {e}")
+
+    def sample(self, cpu: float, memory: float, loop_lag: float):
+        if self.samples == 0:
+            self.cpu, self.memory, self.loop_lag = cpu, memory, loop_lag
+        else:
+            self.cpu += self.smoothing * (cpu - self.cpu)
+            self.memory += self.smoothing * (memory - self.memory)
+            self.loop_lag += self.smoothing * (loop_lag - self.loop_lag)
+        self.samples += 1
+        for listener in self._listeners:
+            listener()
+
+    def stats(self) -> dict:
+        return {
+            'cpu_usage': round(self.cpu, 1),
+            'memory_usage': round(self.memory, 1),
+            'loop_lag_ms': round(self.loop_lag * 1000, 2),
+            'samples': self.samples,
+        }
+
+
+class AdmissionController:
+    """Decides whether a new connection may start.
+
+    A connection is admitted while the smoothed load is under every
+    threshold, fewer than ``max_connections`` are active and its business
+    is under ``business_quota`` (0 means no quota). Otherwise it is refused
+    straight away or, with a ``queue_timeout``, waits in FIFO order until a
+    slot frees up or load drops, for at most that long.
+    """
+
+    def __init__(self, max_connections: int = settings.MAX_CONNECTIONS,
+                 business_quota: int = settings.ADMISSION_BUSINESS_QUOTA,
+                 queue_timeout: float = settings.ADMISSION_QUEUE_TIMEOUT,
+                 max_queue: int = settings.ADMISSION_MAX_QUEUE,
+                 sampler: Optional[ResourceSampler] = None,
+                 cpu_threshold: float = settings.CPU_THRESHOLD,
+                 memory_threshold: float = settings.MEMORY_THRESHOLD,
+                 lag_threshold: float = settings.ADMISSION_LAG_THRESHOLD):
+        self.max_connections = max_connections
+        self.business_quota = business_quota
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.sampler = sampler or resource_sampler
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.lag_threshold = lag_threshold
+        self.active = 0
+        self._per_business: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[Optional[str], asyncio.Future]] = deque()
+        self._metrics = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0}
+        self.sampler.add_listener(self._wake)
+
+    def overload_reason(self) -> Optional[str]:
+        sampler = self.sampler
+        if sampler.cpu > self.cpu_threshold:
+            return 'cpu'
+        if sampler.memory > self.memory_threshold:
+            return 'memory'
+        if sampler.loop_lag > self.lag_threshold:
+            return 'loop_lag'
+        return None
+
+    def _fits(self, business_id: Optional[str]) -> bool:
+        if self.active >= self.max_connections:
+            return False
+        if self.business_quota and business_id is not None:
+            return self._per_business.get(business_id, 0) < self.business_quota
+        return True
+
+    def _take(self, business_id: Optional[str]):
+        self.active += 1
+        if business_id is not None:
+            self._per_business[business_id] = self._per_business.get(business_id, 0) + 1
+        self._metrics['admitted'] += 1
+
+    async def admit(self, business_id: Optional[str] = None,
+                    timeout: Optional[float] = None) -> bool:
+        self.sampler.start()
+        # Waiters are woken on every release and sample, so any still queued
+        # are blocked on capacity or their own quota, never on this caller
+        if self.overload_reason() is None and self._fits(business_id):
+            self._take(business_id)
+            return True
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        if timeout <= 0 or len(self._waiters) >= self.max_queue:
+            self._metrics['rejected'] += 1
+            logger.warning(f"Connection rejected for {business_id}: "
+                           f"{self.overload_reason() or 'at capacity'}")
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (business_id, future)
+        self._waiters.append(waiter)
+        self._metrics['queued'] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # Granted just as the caller gave up: hand the slot back
+                self.release(business_id)
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._metrics['timed_out'] += 1
+            return False
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, business_id: Optional[str] = None):
+        self.active = max(0, self.active - 1)
+        if business_id is not None:
+            remaining = self._per_business.get(business_id, 0) - 1
+            if remaining > 0:
+                self._per_business[business_id] = remaining
+            else:
+                self._per_business.pop(business_id, None)
+        self._wake()
+
+    def _wake(self):
+        """Grant queued callers, oldest first, while load and capacity allow"""
+        if not self._waiters or self.overload_reason() is not None:
+            return
+        for waiter in list(self._waiters):
+            business_id, future = waiter
+            if future.done():
+                continue
+            if self.active >= self.max_connections:
+                break
+            if self._fits(business_id):
+                self._take(business_id)
+                future.set_result(True)
+                self._waiters.remove(waiter)
+
+    def stats(self) -> dict:
+        return {
+            **self._metrics,
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'overloaded': self.overload_reason(),
+            'load': self.sampler.stats(),
+        }
+
+
+resource_sampler = ResourceSampler()
@@ -6,8 +6,10 @@ import io
 import wave
 import gc
 from weakref import WeakSet
-import concurrent.futures
-from .message_queue import MessageQueue
+from .message_queue import message_bus
+from .ring_buffer import AudioRingBuffer, BufferOverflowError, DROP_OLDEST
+from .dsp_worker import dsp_worker, process_batch
+from config import settings
 import asyncio
 import logging
 
@@ -16,16 +18,16 @@ logger = logging.getLogger(__name__)
 class AudioProcessor:
     _instances = WeakSet()
     
-    def __init__(self, sample_rate: int = 16000, buffer_size: int = 10):
+    def __init__(self, sample_rate: int = 16000, buffer_size: int = 10,
+                 overflow: str = DROP_OLDEST):
         self.sample_rate = sample_rate
-        self.buffer = []
         self._lock = threading.Lock()
         self.buffer_size = buffer_size
-        self._total_bytes = 0
-        self.MAX_BUFFER_BYTES = 1024 * 1024  # 1MB limit
-        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.MAX_BUFFER_BYTES = settings.AUDIO_MAX_BUFFER_BYTES
+        self.buffer = AudioRingBuffer(capacity=self.MAX_BUFFER_BYTES, overflow=overflow)
+        self._pending_chunks = 0
         self._instances.add(self)
-        self.message_queue = MessageQueue()
+        self.message_queue = message_bus
         self._setup_queue()
         
     def _setup_queue(self):
@@ -33,7 +35,10 @@ class AudioProcessor:
         
     async def _init_queue(self):
         await self.message_queue.create_queue('audio_processing')
-        await self.message_queue.subscribe('audio_processing', self._process_queued_audio)
+        # Instances compete for queued audio rather than each processing every message
+        await self.message_queue.subscribe(
+            'audio_processing', self._process_queued_audio, group='audio_processors'
+        )
         
     async def _process_queued_audio(self, audio_data: bytes):
         try:
@@ -50,54 +55,48 @@ class AudioProcessor:
         gc.collect()
     
     async def cleanup(self):
+        await self.message_queue.unsubscribe('audio_processing', self._process_queued_audio)
         with self._lock:
             self.buffer.clear()
-            self._total_bytes = 0
-        self._executor.shutdown(wait=False)
+            self._pending_chunks = 0
         
-    def _check_buffer_limit(self, size: int) -> bool:
-        return (self._total_bytes + size) <= self.MAX_BUFFER_BYTES
-        
-    def normalize_audio(self, audio_data: bytes, target_sample_rate: int) -> Optional[bytes]:
+    def normalize_audio(self, audio_data, target_sample_rate: int) -> Optional[bytes]:
         try:
             audio_array = np.frombuffer(audio_data, dtype=np.int16)
             if len(audio_array) == 0:
                 return None
-                
-            # Apply noise reduction
-            normalized = signal.medfilt(audio_array, kernel_size=3)
-            normalized = np.int16(normalized / np.max(np.abs(normalized)) * 32767)
-            
-            # Resample if needed
-            if self.sample_rate != target_sample_rate:
-                duration = len(normalized) / self.sample_rate
-                target_length = int(duration * target_sample_rate)
-                normalized = signal.resample(normalized, target_length)
-            
-            return normalized.tobytes()
+
+            # Noise reduction, gain and polyphase resampling as a one-row batch
+            normalized = process_batch(audio_array[np.newaxis, :], self.sample_rate, target_sample_rate)
+            return normalized[0].tobytes()
         except Exception as e:
             print(f"Audio normalization error: {e}")
             return None
             
     async def process_chunk(self, chunk: bytes) -> Optional[bytes]:
-        if not chunk or not self._check_buffer_limit(len(chunk)):
+        if not chunk:
             return None
             
         with self._lock:
-            self.buffer.append(chunk)
-            self._total_bytes += len(chunk)
+            try:
+                self.buffer.write(chunk)
+            except BufferOverflowError as e:
+                logger.warning(f"Dropping audio chunk: {e}")
+                return None
+            self._pending_chunks += 1
             
-            if len(self.buffer) >= self.buffer_size:
-                combined = b''.join(self.buffer)
-                self.buffer.clear()
-                self._total_bytes = 0
-                try:
-                    return await self._process_audio(combined)
-                finally:
-                    if self._total_bytes > self.MAX_BUFFER_BYTES * 0.8:
-                        await self.cleanup()
-                
-        return None
+            if self._pending_chunks < self.buffer_size and not self.buffer.above_high_water:
+                return None
+            self._pending_chunks = 0
+            # One copy per batch; the lock must not be held across the await below
+            combined = self.buffer.read()
+
+        return await self._process_audio(combined)
         
-    async def _process_audio(self, audio_data: bytes) -> Optional[bytes]:
-        return self.normalize_audio(audio_data, self.sample_rate)
\ No newline at end of file
+    async def _process_audio(self, audio_data) -> Optional[bytes]:
+        try:
+            # Batched with every other session's audio on the shared DSP worker
+            return await dsp_worker.submit(audio_data, self.sample_rate, self.sample_rate) or None
+        except Exception as e:
+            logger.error(f"Audio normalization error: {e}")
+            return None
\ No newline at end of file
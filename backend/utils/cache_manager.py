@@ -1,65 +1,112 @@
-from typing import Any, Optional
-import time
-from functools import wraps
-from redis import asyncio as aioredis
+from typing import Any, Optional, Sequence
+import logging
+import orjson
+from cache import RedisCache, business_tag
 from config import settings
-from .message_queue import MessageQueue
+from .message_queue import message_bus
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 class CacheManager:
-    def __init__(self):
-        self.redis = aioredis.from_url(settings.REDIS_URL)
-        self.message_queue = MessageQueue()
-        self._setup_queue()
-        
-    def _setup_queue(self):
-        asyncio.create_task(self._init_queue())
-        
-    async def _init_queue(self):
+    """Invalidation front end for ``RedisCache``.
+
+    Redis-side deletes run once: inline for keys and tags, or on a single
+    member of the 'cache_invalidators' group for queued pattern clears.
+    Every worker's L1 is then told over Redis pub/sub which keys to drop,
+    so each worker must ``start()`` its manager for peers' invalidations
+    to reach it.
+    """
+    def __init__(self, cache: Optional[RedisCache] = None):
+        self.cache = cache or RedisCache()
+        self.redis = self.cache.redis
+        self.message_queue = message_bus
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._listener is not None:
+            return
         await self.message_queue.create_queue('cache_events')
-        await self.message_queue.subscribe('cache_events', self._handle_cache_event)
-        
+        await self.message_queue.subscribe('cache_events', self._handle_cache_event,
+                                           group='cache_invalidators')
+        self._listener = asyncio.create_task(self._listen_invalidations())
+
     async def _handle_cache_event(self, event: dict):
         if event['type'] == 'invalidate':
-            await self.redis.delete(event['key'])
+            await self.invalidate(event['key'])
+        elif event['type'] == 'invalidate_tags':
+            await self.invalidate_tags(*event['tags'])
         elif event['type'] == 'clear_pattern':
-            pattern = event['pattern']
-            keys = await self.redis.keys(pattern)
-            if keys:
-                await self.redis.delete(*keys)
-                
+            await self._clear_pattern_now(event['pattern'])
+
+    async def _broadcast(self, invalidation: dict):
+        try:
+            await self.redis.publish(settings.CACHE_INVALIDATION_CHANNEL, orjson.dumps(invalidation))
+        except Exception as e:
+            # Peers still drop their copy once CACHE_L1_TTL runs out
+            logger.warning(f"Failed to broadcast cache invalidation: {e}")
+
+    async def _listen_invalidations(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    self._apply_invalidation(orjson.loads(message['data']))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    def _apply_invalidation(self, invalidation: dict):
+        if 'keys' in invalidation:
+            self.cache.invalidate_local(*invalidation['keys'])
+        if 'pattern' in invalidation:
+            self.cache.l1.pop_matching(invalidation['pattern'])
+
     async def invalidate(self, key: str):
-        await self.redis.delete(key)
-        await self.message_queue.publish('cache_events', {
-            'type': 'invalidate',
-            'key': key
-        })
-        
+        await self.cache.delete(key)
+        await self._broadcast({'keys': [key]})
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        keys = await self.cache.delete_tags(*tags)
+        if keys:
+            await self._broadcast({'keys': keys})
+        return len(keys)
+
+    async def invalidate_business(self, business_id: str) -> int:
+        return await self.invalidate_tags(business_tag(business_id))
+
     async def clear_pattern(self, pattern: str):
+        """Queue a pattern clear; prefer tags, since this walks the whole keyspace"""
         await self.message_queue.publish('cache_events', {
             'type': 'clear_pattern',
             'pattern': pattern
         })
-        
+
+    async def _clear_pattern_now(self, pattern: str):
+        deleted = await self.cache.delete_matching(pattern)
+        await self._broadcast({'pattern': pattern})
+        logger.info(f"Cleared {deleted} keys matching {pattern}")
+
     async def get(self, key: str) -> Optional[Any]:
-        value = await self.redis.get(key)
-        return value.decode() if value else None
-        
-    async def set(self, key: str, value: Any, ttl: int = None):
-        await self.redis.set(key, value, ex=ttl or settings.CACHE_TTL)
-        
-    def cached(self, prefix: str, ttl: Optional[int] = None):
-        def decorator(func):
-            @wraps(func)
-            async def wrapper(*args, **kwargs):
-                key = f"{prefix}:{args}:{kwargs}"
-                cached_value = await self.get(key)
-                
-                if cached_value:
-                    return cached_value
-                    
-                result = await func(*args, **kwargs)
-                await self.set(key, result, ttl)
-                return result
-            return wrapper
-        return decorator
\ No newline at end of file
+        return await self.cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: int = None, tags: Sequence[str] = ()):
+        await self.cache.set(key, value, ttl or settings.CACHE_TTL, tags)
+
+    def cached(self, prefix: str, ttl: Optional[int] = None, tags=None):
+        return self.cache.cached(prefix, ttl or settings.CACHE_TTL, tags)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.message_queue.unsubscribe('cache_events', self._handle_cache_event)
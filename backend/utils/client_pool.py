@@ -0,0 +1,24 @@
+from typing import Any, Callable, Optional
+
+from config import settings
+from .resource_pool import ResourcePool
+
+
+class ClientPool(ResourcePool):
+    """Bounded async pool of expensive, reusable API clients.
+
+    Clients are created on the I/O thread pool since gRPC channel setup and
+    credential discovery block. Borrowed clients that raise are discarded,
+    clients older than ``max_age`` are recycled, and at least ``min_size``
+    warm clients are kept around.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any],
+                 min_size: int = settings.POOL_MIN_SIZE,
+                 max_size: int = settings.CLIENT_POOL_MAX_SIZE,
+                 max_age: float = settings.POOL_MAX_AGE,
+                 acquire_timeout: float = settings.POOL_ACQUIRE_TIMEOUT,
+                 health_check: Optional[Callable[[Any], bool]] = None):
+        super().__init__(name, factory, min_size=min_size, max_size=max_size, max_age=max_age,
+                         acquire_timeout=acquire_timeout, validate=health_check,
+                         blocking_factory=True)
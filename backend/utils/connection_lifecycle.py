@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionRecord:
+    """A live connection as seen by the lifecycle scheduler.
+
+    ``owner`` supplies the policy: its ``idle_timeout`` and
+    ``ping_interval`` (0 disables heartbeats) are read whenever the record's
+    timer fires, and its ``heartbeat(record)`` and ``expire(record)``
+    coroutines are called from the scheduler task.
+    """
+    __slots__ = ('id', 'transport', 'owner', 'connected_at', 'last_seen', 'last_ping',
+                 '_bucket', '_due')
+
+    def __init__(self, id: str, transport: Any, owner: Any):
+        now = time.monotonic()
+        self.id = id
+        self.transport = transport
+        self.owner = owner
+        self.connected_at = now
+        self.last_seen = now
+        self.last_ping = now
+        self._bucket: Optional[Dict[int, 'ConnectionRecord']] = None
+        self._due = 0
+
+    def touch(self):
+        # Deliberately just a store: the timer is re-armed lazily when it fires
+        self.last_seen = time.monotonic()
+
+
+class HierarchicalTimingWheel:
+    """Timers bucketed by tick over ``levels`` wheels of ``slots`` each.
+
+    A slot on level n spans ``slots ** n`` ticks; when the level below
+    wraps, that slot is cascaded down, so every timer is moved at most
+    ``levels`` times. Scheduling and cancelling are a dict insert and pop.
+    Deadlines beyond the horizon wait in the farthest slot and are re-filed
+    each time it cascades.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 3):
+        self.tick = tick
+        self.slots = slots
+        self._levels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._spans = [slots ** level for level in range(levels)]
+        self._origin = time.monotonic()
+        self._now = 0
+        self._count = 0
+
+    def _ticks(self, at: float) -> int:
+        return int((at - self._origin) / self.tick)
+
+    def _place(self, record: ConnectionRecord, due: int):
+        for level, span in enumerate(self._spans):
+            if due // span - self._now // span < self.slots:
+                bucket = self._levels[level][(due // span) % self.slots]
+                break
+        else:
+            level = len(self._spans) - 1
+            span = self._spans[level]
+            bucket = self._levels[level][(self._now // span + self.slots - 1) % self.slots]
+        bucket[id(record)] = record
+        record._bucket = bucket
+        record._due = due
+
+    def schedule(self, record: ConnectionRecord, at: float):
+        self.cancel(record)
+        self._place(record, max(self._ticks(at), self._now + 1))
+        self._count += 1
+
+    def cancel(self, record: ConnectionRecord):
+        if record._bucket is not None:
+            record._bucket.pop(id(record), None)
+            record._bucket = None
+            self._count -= 1
+
+    def advance(self, now: float) -> List[ConnectionRecord]:
+        """Remove and return every record due by ``now``"""
+        due: List[ConnectionRecord] = []
+        target = self._ticks(now)
+        while self._now < target:
+            self._now += 1
+            for level in range(len(self._spans) - 1, 0, -1):
+                span = self._spans[level]
+                if self._now % span == 0:
+                    bucket = self._levels[level][(self._now // span) % self.slots]
+                    cascading = list(bucket.values())
+                    bucket.clear()
+                    for record in cascading:
+                        self._place(record, record._due)
+            bucket = self._levels[0][self._now % self.slots]
+            for record in bucket.values():
+                record._bucket = None
+                due.append(record)
+            self._count -= len(bucket)
+            bucket.clear()
+        return due
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class ConnectionLifecycle:
+    """Heartbeats and idle timeouts for every connection in the worker.
+
+    One wheel and one task replace a sleeping ping task per connection and
+    periodic scans: each record has a single timer set to its next ping or
+    idle deadline, whichever is sooner. Activity only stamps ``last_seen``;
+    a timer that fires for a connection that was active since is re-filed.
+    """
+
+    def __init__(self, tick: float = settings.CONNECTION_TICK):
+        self.wheel = HierarchicalTimingWheel(tick)
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {'pings': 0, 'ping_failures': 0, 'expired': 0}
+
+    def add(self, record: ConnectionRecord):
+        self._arm(record, time.monotonic())
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, record: ConnectionRecord):
+        self.wheel.cancel(record)
+
+    def _arm(self, record: ConnectionRecord, now: float):
+        owner = record.owner
+        deadline = record.last_seen + owner.idle_timeout
+        if owner.ping_interval:
+            deadline = min(deadline, record.last_ping + owner.ping_interval)
+        if not math.isfinite(deadline):
+            # No heartbeat and no idle timeout: nothing will ever be due
+            self.wheel.cancel(record)
+            return
+        self.wheel.schedule(record, max(deadline, now))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.sleep(self.wheel.tick)
+                await self._fire(time.monotonic())
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Connection lifecycle error: {e}")
+
+    async def _fire(self, now: float):
+        pings, expired = [], []
+        for record in self.wheel.advance(now):
+            owner = record.owner
+            if now - record.last_seen >= owner.idle_timeout:
+                expired.append(record)
+                continue
+            if owner.ping_interval and now - record.last_ping >= owner.ping_interval:
+                record.last_ping = now
+                pings.append(record)
+            self._arm(record, now)
+        if pings:
+            # Bounded by the tick so one stuck socket cannot stall the wheel
+            results = await asyncio.gather(
+                *(asyncio.wait_for(record.owner.heartbeat(record), self.wheel.tick) for record in pings),
+                return_exceptions=True
+            )
+            self._metrics['pings'] += len(pings)
+            for record, result in zip(pings, results):
+                if isinstance(result, BaseException):
+                    self._metrics['ping_failures'] += 1
+                    self.wheel.cancel(record)
+                    expired.append(record)
+        if expired:
+            self._metrics['expired'] += len(expired)
+            await asyncio.gather(*(record.owner.expire(record) for record in expired),
+                                 return_exceptions=True)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {**self._metrics, 'scheduled': len(self.wheel)}
+
+
+connection_lifecycle = ConnectionLifecycle()
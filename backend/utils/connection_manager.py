@@ -1,29 +1,46 @@
-from typing import Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List
 import asyncio
-from datetime import datetime, timedelta
-import psutil
 import logging
 import backoff
 from contextlib import asynccontextmanager
-from .message_queue import MessageQueue
+from config import settings
+from .admission import AdmissionController
+from .connection_lifecycle import ConnectionRecord, connection_lifecycle
+from .message_queue import message_bus
+from .resource_pool import ResourcePool
+
+class ClientConnection(ConnectionRecord):
+    __slots__ = ('business_id',)
+
+    def __init__(self, id: str, session, owner, business_id: Optional[str] = None):
+        super().__init__(id, session, owner)
+        self.business_id = business_id
 
 class ConnectionManager:
-    def __init__(self, max_connections: int = 100):
-        self.active_connections: Dict[str, dict] = {}
+    # Clients are only expired for inactivity; sessions have no heartbeat
+    ping_interval = 0
+
+    def __init__(self, max_connections: int = 100,
+                 idle_timeout: float = settings.CONNECTION_IDLE_TIMEOUT,
+                 admission: Optional[AdmissionController] = None):
+        self.active_connections: Dict[str, ClientConnection] = {}
         self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.lifecycle = connection_lifecycle
+        self.admission = admission or AdmissionController(max_connections=max_connections)
         self.health_metrics = {
             'cpu_usage': 0,
             'memory_usage': 0,
             'connection_count': 0
         }
-        self._connection_pools = {}
+        self._connection_pools: Dict[str, ResourcePool] = {}
         self._backoff_config = {
-            'max_tries': 3,
-            'max_time': 30,
-            'factor': 2
+            'max_tries': settings.BACKOFF_MAX_TRIES,
+            'max_time': settings.BACKOFF_MAX_TIME,
+            'factor': settings.BACKOFF_FACTOR
         }
         self._setup_logging()
-        self.message_queue = MessageQueue()
+        self.message_queue = message_bus
         asyncio.create_task(self._setup_queue())
         
     def _setup_logging(self):
@@ -36,7 +53,7 @@ class ConnectionManager:
         
     async def _handle_connection_event(self, event: dict):
         if event['type'] == 'cleanup':
-            await self.cleanup_inactive(event.get('timeout', 30))
+            await self.cleanup_inactive(event.get('timeout', self.idle_timeout / 60))
         elif event['type'] == 'disconnect':
             await self.disconnect(event['client_id'])
             
@@ -47,78 +64,74 @@ class ConnectionManager:
         })
         
     async def get_health_metrics(self) -> dict:
+        load = self.admission.sampler
         self.health_metrics.update({
-            'cpu_usage': psutil.cpu_percent(),
-            'memory_usage': psutil.virtual_memory().percent,
+            'cpu_usage': load.cpu,
+            'memory_usage': load.memory,
             'connection_count': len(self.active_connections)
         })
         return self.health_metrics
         
-    async def connect(self, client_id: str, session: any) -> bool:
-        metrics = await self.get_health_metrics()
-        if metrics['cpu_usage'] > 80 or metrics['memory_usage'] > 80:
-            self.logger.warning("Resource usage too high, rejecting connection")
-            return False
-            
-        if len(self.active_connections) >= self.max_connections:
+    async def connect(self, client_id: str, session: any, business_id: Optional[str] = None,
+                      timeout: Optional[float] = None) -> bool:
+        """Admit and track a client; ``timeout`` overrides ADMISSION_QUEUE_TIMEOUT"""
+        if client_id in self.active_connections:
+            await self.disconnect(client_id)
+        if not await self.admission.admit(business_id, timeout):
             return False
             
-        self.active_connections[client_id] = {
-            'session': session,
-            'connected_at': datetime.now(),
-            'last_activity': datetime.now()
-        }
+        record = ClientConnection(client_id, session, self, business_id)
+        self.active_connections[client_id] = record
+        self.lifecycle.add(record)
         return True
         
     async def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+        record = self.active_connections.pop(client_id, None)
+        if record is not None:
+            self.lifecycle.discard(record)
+            self.admission.release(record.business_id)
+
+    async def expire(self, record: ClientConnection):
+        await self.disconnect(record.id)
             
     def update_activity(self, client_id: str):
-        if client_id in self.active_connections:
-            self.active_connections[client_id]['last_activity'] = datetime.now()
+        record = self.active_connections.get(client_id)
+        if record is not None:
+            record.touch()
             
-    async def cleanup_inactive(self, timeout_minutes: int = 30):
-        while True:
-            try:
-                now = datetime.now()
-                timeout = timedelta(minutes=timeout_minutes)
-                
-                for client_id, data in list(self.active_connections.items()):
-                    if now - data['last_activity'] > timeout:
-                        await self.disconnect(client_id)
-                        
-                metrics = await self.get_health_metrics()
-                if metrics['connection_count'] > self.max_connections * 0.8:
-                    self.logger.warning("High connection load detected")
-            except Exception as e:
-                self.logger.error(f"Cleanup error: {e}")
-            finally:
-                await asyncio.sleep(60)  # Check every minute
+    async def cleanup_inactive(self, timeout_minutes: float = 30):
+        """Change the idle timeout; expiry itself runs on ``connection_lifecycle``.
+
+        Timers already armed keep their deadline, so a shorter timeout
+        applies to each client the next time its timer fires.
+        """
+        self.idle_timeout = timeout_minutes * 60
+        metrics = await self.get_health_metrics()
+        if metrics['connection_count'] > self.max_connections * settings.CONNECTION_WARN_THRESHOLD:
+            self.logger.warning("High connection load detected")
+
+    def register_pool(self, pool_name: str, factory: Callable[[], Any], **options) -> ResourcePool:
+        """Pool connections made by ``factory`` (retried with backoff) under ``pool_name``"""
+        factory = backoff.on_exception(
+            backoff.expo,
+            Exception,
+            **self._backoff_config
+        )(factory)
+        options.setdefault('max_size', self.max_connections)
+        pool = ResourcePool(pool_name, factory, **options)
+        self._connection_pools[pool_name] = pool
+        return pool
 
     @asynccontextmanager
     async def get_connection(self, pool_name: str):
-        if pool_name not in self._connection_pools:
-            self._connection_pools[pool_name] = []
-        
-        try:
-            conn = await self._get_connection_with_backoff(pool_name)
+        pool = self._connection_pools.get(pool_name)
+        if pool is None:
+            raise KeyError(f"No connection pool registered as {pool_name!r}")
+        async with pool.borrow() as conn:
             yield conn
-        finally:
-            await self._release_connection(pool_name, conn)
-            
-    @backoff.on_exception(
-        backoff.expo,
-        Exception,
-        max_tries=3
-    )
-    async def _get_connection_with_backoff(self, pool_name: str):
-        pool = self._connection_pools[pool_name]
-        if not pool:
-            conn = await self._create_connection(pool_name)
-            return conn
-        return pool.pop()
-        
-    async def _release_connection(self, pool_name: str, conn):
-        if conn and len(self._connection_pools[pool_name]) < self.max_connections:
-            self._connection_pools[pool_name].append(conn)
\ No newline at end of file
+
+    async def close_pools(self):
+        await asyncio.gather(*(pool.close() for pool in self._connection_pools.values()))
+
+    def pool_stats(self) -> Dict[str, dict]:
+        return {name: pool.stats() for name, pool in self._connection_pools.items()}
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from math import gcd
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage, signal
+
+from config import settings
+from .executors import run_cpu_array
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=32)
+def polyphase_filter(up: int, down: int) -> np.ndarray:
+    """Anti-aliasing FIR taps as designed by scipy.signal.resample_poly.
+
+    Returned unscaled so they can be passed as ``window`` to resample_poly,
+    which applies the ``up`` gain itself.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    taps.setflags(write=False)
+    return taps
+
+
+def resample_ratio(from_rate: int, to_rate: int) -> Tuple[int, int]:
+    g = gcd(from_rate, to_rate)
+    return to_rate // g, from_rate // g
+
+
+def resampled_length(length: int, from_rate: int, to_rate: int) -> int:
+    up, down = resample_ratio(from_rate, to_rate)
+    return -(-length * up // down)
+
+
+def process_batch(batch: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """Median filter, peak-normalize and resample every row of an int16 batch.
+
+    Rows shorter than the batch are zero padded on the right, which matches
+    the zero padding medfilt and resample_poly apply at the edges anyway.
+    """
+    filtered = ndimage.median_filter(batch, size=(1, 3), mode='constant')
+    peak = np.abs(filtered.astype(np.int32)).max(axis=1, keepdims=True)
+    peak[peak == 0] = 1
+    normalized = filtered * (32767 / peak)
+
+    if from_rate != to_rate:
+        up, down = resample_ratio(from_rate, to_rate)
+        normalized = signal.resample_poly(
+            normalized, up, down, axis=1, window=polyphase_filter(up, down)
+        )
+    return np.clip(normalized, -32768, 32767).astype(np.int16)
+
+
+class AudioDSPWorker:
+    """Shared DSP stage that batches normalization/resampling across sessions.
+
+    Sessions ``submit`` their pending audio and await a future. The worker
+    drains everything submitted within ``max_delay`` seconds, groups it by
+    rate pair and length bucket into 2-D int16 batches, and runs each batch
+    through ``process_batch`` on the process pool so the event loop never
+    runs the filters itself.
+    """
+
+    def __init__(self, max_batch: int = settings.QUEUE_BATCH_SIZE,
+                 max_delay: float = 0.005,
+                 max_in_flight: int = settings.PROCESS_POOL_SIZE):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[tuple] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._max_in_flight = max_in_flight
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {'batches': 0, 'items': 0, 'errors': 0}
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self._max_in_flight)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, audio, from_rate: int, to_rate: int) -> bytes:
+        """Queue 16-bit PCM for processing. ``audio`` must stay valid until this returns."""
+        samples = np.frombuffer(audio, dtype=np.int16)
+        if samples.size == 0:
+            return b''
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((samples, from_rate, to_rate, future))
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            try:
+                await self._wakeup.wait()
+                # Give concurrent sessions a moment to join the batch
+                if len(self._pending) < self.max_batch:
+                    await asyncio.sleep(self.max_delay)
+                self._wakeup.clear()
+
+                pending = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                if self._pending:
+                    self._wakeup.set()
+
+                for key, items in self._group(pending).items():
+                    # Waiting for a slot lets the next batch keep growing meanwhile
+                    await self._slots.acquire()
+                    asyncio.create_task(self._run_batch(key[0], key[1], items))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"DSP worker error: {e}")
+
+    @staticmethod
+    def _group(pending: List[tuple]) -> Dict[tuple, List[tuple]]:
+        groups = defaultdict(list)
+        for item in pending:
+            samples, from_rate, to_rate, future = item
+            if future.done():
+                continue
+            # Power-of-two length buckets bound the padding waste per batch
+            bucket = max(len(samples) - 1, 1).bit_length()
+            groups[(from_rate, to_rate, bucket)].append(item)
+        return groups
+
+    async def _run_batch(self, from_rate: int, to_rate: int, items: List[tuple]):
+        try:
+            width = max(len(item[0]) for item in items)
+            batch = np.zeros((len(items), width), dtype=np.int16)
+            for row, item in enumerate(items):
+                batch[row, :len(item[0])] = item[0]
+
+            result = await run_cpu_array(
+                process_batch, batch, from_rate, to_rate,
+                out_shape=(len(items), resampled_length(width, from_rate, to_rate)),
+                out_dtype=np.int16
+            )
+            self._metrics['batches'] += 1
+            self._metrics['items'] += len(items)
+
+            for row, (samples, _, _, future) in enumerate(items):
+                if not future.done():
+                    length = resampled_length(len(samples), from_rate, to_rate)
+                    future.set_result(result[row, :length].tobytes())
+        except Exception as e:
+            self._metrics['errors'] += 1
+            logger.error(f"DSP batch failed: {e}")
+            for _, _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for _, _, _, future in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending = []
+
+    def stats(self) -> dict:
+        batches = self._metrics['batches']
+        return {
+            **self._metrics,
+            'pending': len(self._pending),
+            'avg_batch_size': round(self._metrics['items'] / batches, 2) if batches else 0.0,
+        }
+
+
+dsp_worker = AudioDSPWorker()
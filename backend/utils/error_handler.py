@@ -5,7 +5,7 @@ import traceback
 from contextlib import contextmanager
 import asyncio
 from datetime import datetime
-from .message_queue import MessageQueue
+from .message_queue import message_bus
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +14,7 @@ class RetryableError(Exception):
 
 class ErrorHandler:
     def __init__(self):
-        self.message_queue = MessageQueue()
+        self.message_queue = message_bus
         self._setup_queue()
         
     def _setup_queue(self):
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Modules preloaded once by the fork server so CPU jobs start warm. __main__
+# is deliberately absent: importing app.py in a worker would re-run startup.
+CPU_WORKER_PRELOAD = ['numpy', 'scipy.signal', 'scipy.ndimage', 'utils.dsp_worker']
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_io_pool: Optional[ThreadPoolExecutor] = None
+_metrics = {
+    'cpu_submitted': 0,
+    'cpu_completed': 0,
+    'cpu_inline': 0,
+    'io_submitted': 0,
+    'io_completed': 0,
+}
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(CPU_WORKER_PRELOAD)
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.PROCESS_POOL_SIZE,
+            mp_context=context
+        )
+    return _process_pool
+
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(
+            max_workers=settings.IO_POOL_SIZE,
+            thread_name_prefix="io"
+        )
+    return _io_pool
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking I/O (sync SDK calls, file access) on the shared thread pool"""
+    loop = asyncio.get_running_loop()
+    _metrics['io_submitted'] += 1
+    try:
+        return await loop.run_in_executor(_get_io_pool(), partial(func, *args, **kwargs))
+    finally:
+        _metrics['io_completed'] += 1
+
+
+async def run_cpu(func: Callable, *args) -> Any:
+    """Run a picklable CPU-bound function on the process pool"""
+    loop = asyncio.get_running_loop()
+    _metrics['cpu_submitted'] += 1
+    try:
+        return await loop.run_in_executor(_get_process_pool(), func, *args)
+    finally:
+        _metrics['cpu_completed'] += 1
+
+
+def _shared_call(func: Callable, in_name: str, in_shape: Tuple[int, ...], in_dtype: str,
+                 out_name: str, out_shape: Tuple[int, ...], out_dtype: str, args: tuple) -> None:
+    """Worker side of run_cpu_array: read input and write output in place"""
+    # Fork-server workers share the parent's resource tracker, so attaching
+    # here does not transfer ownership; the parent unlinks both segments
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        source = np.ndarray(in_shape, dtype=in_dtype, buffer=in_shm.buf)
+        target = np.ndarray(out_shape, dtype=out_dtype, buffer=out_shm.buf)
+        target[...] = func(source, *args)
+        del source, target
+    finally:
+        in_shm.close()
+        out_shm.close()
+
+
+async def run_cpu_array(func: Callable, array: np.ndarray, *args,
+                        out_shape: Optional[Tuple[int, ...]] = None,
+                        out_dtype: Any = None) -> np.ndarray:
+    """Run ``func(array, *args)`` on the process pool via shared memory.
+
+    Input and output travel through shared-memory segments instead of being
+    pickled; only their names and shapes cross the process boundary. Arrays
+    smaller than CPU_OFFLOAD_MIN_BYTES run inline, where the round trip to a
+    worker would cost more than the work itself.
+    """
+    out_shape = tuple(out_shape if out_shape is not None else array.shape)
+    out_dtype = np.dtype(out_dtype if out_dtype is not None else array.dtype)
+    if array.nbytes < settings.CPU_OFFLOAD_MIN_BYTES:
+        _metrics['cpu_inline'] += 1
+        return np.asarray(func(array, *args), dtype=out_dtype).reshape(out_shape)
+
+    in_shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    out_size = int(np.prod(out_shape)) * out_dtype.itemsize
+    out_shm = shared_memory.SharedMemory(create=True, size=max(out_size, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=in_shm.buf)[...] = array
+        await run_cpu(
+            _shared_call, func,
+            in_shm.name, array.shape, array.dtype.str,
+            out_shm.name, out_shape, out_dtype.str, args
+        )
+        return np.ndarray(out_shape, dtype=out_dtype, buffer=out_shm.buf).copy()
+    finally:
+        for shm in (in_shm, out_shm):
+            shm.close()
+            shm.unlink()
+
+
+def executor_stats() -> Dict[str, int]:
+    return {
+        **_metrics,
+        'cpu_queue_depth': _metrics['cpu_submitted'] - _metrics['cpu_completed'],
+        'io_queue_depth': _metrics['io_submitted'] - _metrics['io_completed'],
+    }
+
+
+def shutdown_executors(wait: bool = True):
+    global _process_pool, _io_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=wait, cancel_futures=True)
+        _process_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=wait)
+        _io_pool = None
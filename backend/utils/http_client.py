@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from twilio.http import AsyncHttpClient
+from twilio.http.response import Response as TwilioResponse
+
+from config import settings
+from .performance_monitor import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+# Failures where the request never reached the server, so even a POST is safe to resend
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of request volume.
+
+    Every first attempt deposits ``ratio`` of a token and the bucket also
+    refills at ``min_per_sec``, so a trickle of retries is always allowed;
+    each retry spends one token. When an upstream is down, retries stop at
+    roughly ``ratio`` extra load instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float = settings.HTTP_RETRY_BUDGET_RATIO,
+                 min_per_sec: float = settings.HTTP_RETRY_BUDGET_MIN_PER_SEC,
+                 max_tokens: float = settings.HTTP_RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens,
+                          self.tokens + amount + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def record_request(self):
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.spent += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> dict:
+        self._refill()
+        return {'tokens': round(self.tokens, 2), 'spent': self.spent, 'denied': self.denied}
+
+
+class OutboundClient:
+    """The process-wide client for outbound HTTP.
+
+    One pooled HTTP/2 ``httpx.AsyncClient`` carries every call, so
+    connections (and, per host, multiplexed streams) are reused. Retries
+    back off exponentially with jitter, honour ``Retry-After`` and draw
+    on a shared ``RetryBudget``. Each attempt is timed into the metrics
+    registry per host.
+    """
+
+    def __init__(self, http2: bool = True, pool_size: int = settings.HTTP_POOL_SIZE,
+                 timeout: float = settings.TIMEOUT, max_retries: int = settings.MAX_RETRIES,
+                 budget: Optional[RetryBudget] = None, registry: Optional[MetricsRegistry] = None):
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_keepalive_connections=pool_size, max_connections=pool_size),
+            timeout=timeout
+        )
+        self.max_retries = max_retries
+        self.budget = budget or RetryBudget()
+        self.metrics = registry or metrics
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), settings.BACKOFF_MAX_TIME)
+            except ValueError:
+                pass  # HTTP-date form; fall back to our own backoff
+        base = min(settings.BACKOFF_MAX_TIME, 0.1 * settings.BACKOFF_FACTOR ** attempt)
+        return base * random.uniform(0.5, 1.0)
+
+    async def request(self, method: str, url: str, retry: Optional[bool] = None,
+                      **kwargs) -> httpx.Response:
+        """Send a request; ``retry`` defaults to whether ``method`` is idempotent"""
+        method = method.upper()
+        retry = method in IDEMPOTENT_METHODS if retry is None else retry
+        upstream = self.metrics.upstream(httpx.URL(url).host)
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            response = None
+            start = time.perf_counter()
+            upstream.in_flight += 1
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                upstream.errors += 1
+                if not (retry or isinstance(e, UNSENT_ERRORS)) or not self._may_retry(attempt):
+                    raise
+                logger.warning(f"{method} {url} failed ({e!r}), retrying")
+            else:
+                if response.status_code >= 500:
+                    upstream.errors += 1
+                if not retry or response.status_code not in RETRYABLE_STATUS or not self._may_retry(attempt):
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+            finally:
+                upstream.in_flight -= 1
+                upstream.latency.observe(time.perf_counter() - start)
+            attempt += 1
+            await asyncio.sleep(self._delay(attempt, response))
+
+    def _may_retry(self, attempt: int) -> bool:
+        return attempt < self.max_retries and self.budget.try_spend()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'retry_budget': self.budget.stats(), 'max_retries': self.max_retries}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class TwilioHttpClient(AsyncHttpClient):
+    """Lets ``twilio.rest.Client`` make its ``*_async`` calls through ``OutboundClient``"""
+
+    def __init__(self, outbound: OutboundClient, timeout: Optional[float] = None):
+        super().__init__(logging.getLogger('twilio.http_client'), True, timeout)
+        self.outbound = outbound
+
+    async def request(self, method: str, url: str,
+                      params: Optional[Dict[str, object]] = None,
+                      data: Optional[Dict[str, object]] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      auth: Optional[Tuple[str, str]] = None,
+                      timeout: Optional[float] = None,
+                      allow_redirects: bool = False) -> TwilioResponse:
+        response = await self.outbound.request(
+            method, url, params=params, data=data, headers=headers, auth=auth,
+            timeout=timeout or self.timeout or httpx.USE_CLIENT_DEFAULT,
+            follow_redirects=allow_redirects
+        )
+        return TwilioResponse(response.status_code, response.text, response.headers)
+
+
+outbound = OutboundClient()
@@ -1,9 +1,12 @@
 
 import asyncio
-from typing import Dict, Callable, Any, Optional
+import itertools
+import time
+from collections import deque
+from typing import Deque, Dict, Callable, Any, List, Optional
 from datetime import datetime
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 from config import settings
 
@@ -15,56 +18,228 @@ class QueueMessage:
     data: Any
     timestamp: datetime
     retry_count: int = 0
-    max_retries: int = settings.MAX_RETRIES
+    max_retries: int = settings.QUEUE_MAX_RETRIES
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+@dataclass
+class QueueStats:
+    published: int = 0
+    processed: int = 0
+    failed: int = 0
+    retried: int = 0
+    dropped: int = 0
+    latency_avg: float = 0.0
+    latency_max: float = 0.0
+
+    def record_latency(self, latency: float):
+        # Exponentially weighted so the figure tracks current load
+        self.latency_avg += 0.1 * (latency - self.latency_avg)
+        self.latency_max = max(self.latency_max, latency)
+
+class ConsumerGroup:
+    """Subscribers sharing one queue: each message goes to one member.
+
+    Separate groups on the same topic each receive every message.
+    """
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.members: Dict[Callable, asyncio.Task] = {}
 
 class MessageQueue:
+    """In-process topic bus with fan-out, shared by every component via ``message_bus``"""
+
     def __init__(self):
-        self._queues: Dict[str, asyncio.Queue] = {}
-        self._handlers: Dict[str, Callable] = {}
-        self._processing = False
-        
-    async def create_queue(self, name: str, maxsize: int = 0) -> None:
-        if name not in self._queues:
-            self._queues[name] = asyncio.Queue(maxsize=maxsize)
-            
+        self._maxsize: Dict[str, int] = {}
+        self._groups: Dict[str, Dict[str, ConsumerGroup]] = {}
+        self._backlog: Dict[str, Deque[QueueMessage]] = {}
+        self._stats: Dict[str, QueueStats] = {}
+        self._retry_handles: set = set()
+        self._group_ids = itertools.count()
+        self._closed = False
+
+    async def create_queue(self, name: str, maxsize: int = settings.QUEUE_MAX_SIZE) -> None:
+        if name not in self._groups:
+            self._maxsize[name] = maxsize
+            self._groups[name] = {}
+            # Holds messages published before anyone subscribed
+            self._backlog[name] = deque(maxlen=maxsize or None)
+            self._stats[name] = QueueStats()
+
+    def _offer(self, queue_name: str, queue: asyncio.Queue, msg: QueueMessage) -> None:
+        try:
+            queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            # Bounded backlog: a slow subscriber loses its oldest event, not the newest
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(msg)
+            self._stats[queue_name].dropped += 1
+
     async def publish(self, queue_name: str, message: Any) -> bool:
-        if queue_name not in self._queues:
+        if self._closed:
+            return False
+        if queue_name not in self._groups:
             await self.create_queue(queue_name)
-            
+
         try:
             msg = QueueMessage(
                 id=f"{queue_name}_{datetime.now().timestamp()}",
                 data=message,
                 timestamp=datetime.now()
             )
-            await self._queues[queue_name].put(msg)
+            stats = self._stats[queue_name]
+            stats.published += 1
+            groups = self._groups[queue_name]
+            if not groups:
+                backlog = self._backlog[queue_name]
+                if backlog.maxlen is not None and len(backlog) == backlog.maxlen:
+                    stats.dropped += 1
+                backlog.append(msg)
+                return True
+            for group in groups.values():
+                # Each group gets its own copy so retry counts stay independent
+                self._offer(queue_name, group.queue,
+                            msg if len(groups) == 1 else QueueMessage(msg.id, msg.data, msg.timestamp))
             return True
         except Exception as e:
             logger.error(f"Failed to publish message: {e}")
             return False
-            
-    async def subscribe(self, queue_name: str, handler: Callable) -> None:
-        self._handlers[queue_name] = handler
-        if not self._processing:
-            asyncio.create_task(self._process_queues())
-            
-    async def _process_queues(self) -> None:
-        self._processing = True
+
+    async def subscribe(self, queue_name: str, handler: Callable, concurrency: int = 1,
+                        group: Optional[str] = None) -> None:
+        """Attach ``handler`` to a topic.
+
+        Without ``group`` the handler receives every message on the topic.
+        Handlers subscribed with the same ``group`` compete for messages.
+        ``concurrency`` > 1 trades ordering for throughput.
+        """
+        await self.create_queue(queue_name)
+        groups = self._groups[queue_name]
+        group_name = group or f"_sub{next(self._group_ids)}"
+        consumer_group = groups.get(group_name)
+        if consumer_group is None:
+            consumer_group = ConsumerGroup(group_name, self._maxsize[queue_name])
+            groups[group_name] = consumer_group
+            backlog = self._backlog[queue_name]
+            while backlog:
+                self._offer(queue_name, consumer_group.queue, backlog.popleft())
+
+        if handler not in consumer_group.members:
+            consumer_group.members[handler] = asyncio.create_task(
+                self._consume(queue_name, consumer_group, handler, max(1, concurrency))
+            )
+
+    async def unsubscribe(self, queue_name: str, handler: Callable) -> None:
+        for group_name, group in list(self._groups.get(queue_name, {}).items()):
+            task = group.members.pop(handler, None)
+            if task:
+                task.cancel()
+            if not group.members:
+                del self._groups[queue_name][group_name]
+
+    async def _consume(self, queue_name: str, group: ConsumerGroup,
+                       handler: Callable, concurrency: int) -> None:
+        """One consumer per subscriber, woken by its queue rather than polling"""
+        queue = group.queue
+        slots = asyncio.Semaphore(concurrency)
         while True:
             try:
-                for queue_name, queue in self._queues.items():
-                    if not queue.empty() and queue_name in self._handlers:
-                        msg = await queue.get()
-                        try:
-                            await self._handlers[queue_name](msg.data)
-                            queue.task_done()
-                        except Exception as e:
-                            if msg.retry_count < msg.max_retries:
-                                msg.retry_count += 1
-                                await queue.put(msg)
-                            logger.error(f"Error processing message: {e}")
-                            
-                await asyncio.sleep(0.1)
+                batch = [await queue.get()]
+                # Drain whatever else is already waiting in the same wakeup, unless
+                # other group members are competing for the same queue
+                limit = settings.QUEUE_BATCH_SIZE if len(group.members) == 1 else 1
+                while len(batch) < limit and not queue.empty():
+                    batch.append(queue.get_nowait())
+
+                for msg in batch:
+                    if concurrency == 1:
+                        await self._dispatch(queue_name, group, handler, msg)
+                        continue
+                    await slots.acquire()
+                    task = asyncio.create_task(self._dispatch(queue_name, group, handler, msg))
+                    task.add_done_callback(lambda _: slots.release())
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(f"Queue processing error: {e}")
-                await asyncio.sleep(1)
\ No newline at end of file
+
+    async def _dispatch(self, queue_name: str, group: ConsumerGroup,
+                        handler: Callable, msg: QueueMessage) -> None:
+        stats = self._stats[queue_name]
+        stats.record_latency(time.monotonic() - msg.enqueued_at)
+        try:
+            await handler(msg.data)
+            stats.processed += 1
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"Error processing message: {e}")
+            if msg.retry_count < msg.max_retries:
+                msg.retry_count += 1
+                stats.retried += 1
+                self._schedule_retry(queue_name, group, msg)
+            else:
+                stats.dropped += 1
+        finally:
+            group.queue.task_done()
+
+    def _schedule_retry(self, queue_name: str, group: ConsumerGroup, msg: QueueMessage) -> None:
+        loop = asyncio.get_running_loop()
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            msg.enqueued_at = time.monotonic()
+            self._offer(queue_name, group.queue, msg)
+
+        handle = loop.call_later(settings.QUEUE_RETRY_DELAY, requeue)
+        self._retry_handles.add(handle)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                'depth': len(self._backlog[name]) + sum(
+                    group.queue.qsize() for group in self._groups[name].values()
+                ),
+                'subscribers': sum(len(group.members) for group in self._groups[name].values()),
+                'published': stats.published,
+                'processed': stats.processed,
+                'failed': stats.failed,
+                'retried': stats.retried,
+                'dropped': stats.dropped,
+                'latency_avg_ms': round(stats.latency_avg * 1000, 2),
+                'latency_max_ms': round(stats.latency_max * 1000, 2),
+            }
+            for name, stats in self._stats.items()
+        }
+
+    async def close(self, drain_timeout: float = 5.0) -> None:
+        """Shutdown hook: stop accepting events, give consumers a chance to drain, then stop them"""
+        self._closed = True
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+
+        groups: List[ConsumerGroup] = [
+            group for topic in self._groups.values() for group in topic.values()
+        ]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(group.queue.join() for group in groups)), drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Message bus shut down with undelivered events")
+
+        consumers = [task for group in groups for task in group.members.values()]
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        for topic in self._groups.values():
+            topic.clear()
+
+def _create_bus() -> MessageQueue:
+    if settings.MESSAGE_QUEUE_BACKEND == 'redis':
+        from .redis_queue import RedisStreamQueue
+        return RedisStreamQueue()
+    return MessageQueue()
+
+message_bus = _create_bus()
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from .executors import executor_stats
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+
+    Any lag beyond a few milliseconds means something ran synchronously on
+    the loop for that long and every other connection waited behind it.
+    """
+
+    def __init__(self, interval: float = 0.5, stall_threshold: float = 0.1,
+                 smoothing: float = 0.2):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.smoothing = smoothing
+        self.last_lag = 0.0
+        self.avg_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.record(lag)
+
+    def record(self, lag: float):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.avg_lag += self.smoothing * (lag - self.avg_lag)
+        self.samples += 1
+        metrics.loop_lag.observe(lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            logger.warning(f"Event loop stalled for {lag * 1000:.0f}ms")
+
+    def stats(self) -> dict:
+        return {
+            'last_ms': round(self.last_lag * 1000, 2),
+            'avg_ms': round(self.avg_lag * 1000, 2),
+            'max_ms': round(self.max_lag * 1000, 2),
+            'stalls': self.stalls,
+            'samples': self.samples,
+        }
+
+
+loop_lag_monitor = EventLoopLagMonitor()
+
+
+# Upper bounds in seconds; a final +Inf bucket is implied
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WEBSOCKET_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+VOICE_STAGES = ('stt', 'llm_first_token', 'first_sentence', 'time_to_first_audio', 'total')
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing only bumps preallocated counters"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def render(self, name: str, labels: str, lines: List[str]):
+        prefix = f"{labels}," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+
+
+class RouteMetrics:
+    __slots__ = ('kind', 'route', 'in_flight', 'latency', 'errors')
+
+    def __init__(self, kind: str, route: str):
+        self.kind = kind
+        self.route = route
+        self.in_flight = 0
+        self.latency = Histogram(WEBSOCKET_BUCKETS if kind == 'websocket' else HTTP_BUCKETS)
+        self.errors = 0
+
+
+class MetricsRegistry:
+    """Process-wide request, event-loop and voice pipeline metrics.
+
+    Every metric object is created up front (per registered route, per voice
+    stage) so the request path only looks up a dict and bumps counters.
+    Rendered on demand in the Prometheus text format by ``/metrics``.
+    """
+
+    max_cached_paths = 4096
+    max_upstreams = 256
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._patterns: List[Tuple[Pattern, str]] = []
+        self._path_cache: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.voice_stages = {stage: Histogram(HTTP_BUCKETS) for stage in VOICE_STAGES}
+        self.loop_lag = Histogram(LAG_BUCKETS)
+        self.middleware_layers: Dict[str, Histogram] = {}
+        self.upstreams: Dict[str, RouteMetrics] = {}
+        for kind in ('http', 'websocket'):
+            self._routes[(kind, UNMATCHED_ROUTE)] = RouteMetrics(kind, UNMATCHED_ROUTE)
+
+    def register_routes(self, rules: Iterable[str]):
+        """Preallocate metrics for each route template (Quart rule strings)"""
+        for rule in rules:
+            for kind in ('http', 'websocket'):
+                self._routes.setdefault((kind, rule), RouteMetrics(kind, rule))
+            if '<' in rule:
+                pattern = re.compile('^' + re.sub(r'<[^>]+>', '[^/]+', rule) + '$')
+                self._patterns.append((pattern, rule))
+        self._path_cache.clear()
+
+    def route(self, kind: str, path: str) -> RouteMetrics:
+        """Metrics for the route template matching ``path``; cached per raw path"""
+        key = (kind, path)
+        metrics = self._path_cache.get(key)
+        if metrics is not None:
+            return metrics
+        metrics = self._routes.get(key)
+        if metrics is None:
+            rule = next((rule for pattern, rule in self._patterns if pattern.match(path)),
+                        UNMATCHED_ROUTE)
+            metrics = self._routes[(kind, rule)]
+        # Bounded so a path scan cannot grow the cache without limit
+        if len(self._path_cache) < self.max_cached_paths:
+            self._path_cache[key] = metrics
+        return metrics
+
+    def middleware_layer(self, name: str) -> Histogram:
+        """Histogram for a timed middleware layer, created when the chain is compiled"""
+        return self.middleware_layers.setdefault(name, Histogram(HTTP_BUCKETS))
+
+    def upstream(self, host: str) -> RouteMetrics:
+        """Outbound request metrics for ``host``; hosts past the cap share one entry"""
+        metrics = self.upstreams.get(host)
+        if metrics is None:
+            if len(self.upstreams) >= self.max_upstreams:
+                host = UNMATCHED_ROUTE
+            metrics = self.upstreams.setdefault(host, RouteMetrics('upstream', host))
+        return metrics
+
+    def observe_voice_timings(self, timings: Dict[str, Optional[float]]):
+        """Record StageTimings.as_dict() output (milliseconds)"""
+        for stage, histogram in self.voice_stages.items():
+            value = timings.get(f"{stage}_ms")
+            if value is not None:
+                histogram.observe(value / 1000)
+
+    def snapshot(self) -> dict:
+        """Compact JSON view for dashboards: p50/p95 per active route and stage"""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None and value != float('inf') else value
+
+        return {
+            'routes': [
+                {
+                    'kind': m.kind,
+                    'route': m.route,
+                    'count': m.latency.count,
+                    'in_flight': m.in_flight,
+                    'errors': m.errors,
+                    'p50_ms': ms(m.latency.quantile(0.5)),
+                    'p95_ms': ms(m.latency.quantile(0.95)),
+                }
+                for m in self._routes.values() if m.latency.count or m.in_flight
+            ],
+            'voice': {
+                stage: {'count': h.count, 'p50_ms': ms(h.quantile(0.5)), 'p95_ms': ms(h.quantile(0.95))}
+                for stage, h in self.voice_stages.items()
+            },
+            'upstreams': [
+                {
+                    'host': m.route,
+                    'count': m.latency.count,
+                    'in_flight': m.in_flight,
+                    'errors': m.errors,
+                    'p50_ms': ms(m.latency.quantile(0.5)),
+                    'p95_ms': ms(m.latency.quantile(0.95)),
+                }
+                for m in self.upstreams.values()
+            ],
+            'event_loop_lag': loop_lag_monitor.stats(),
+            'executors': executor_stats(),
+        }
+
+    def render(self) -> str:
+        lines: List[str] = [
+            "# HELP thalya_request_duration_seconds HTTP request and websocket connection duration",
+            "# TYPE thalya_request_duration_seconds histogram",
+        ]
+        for m in self._routes.values():
+            m.latency.render('thalya_request_duration_seconds',
+                             f'kind="{m.kind}",route="{m.route}"', lines)
+
+        lines += ["# HELP thalya_requests_in_flight Requests or websockets currently open",
+                  "# TYPE thalya_requests_in_flight gauge"]
+        lines += [f'thalya_requests_in_flight{{kind="{m.kind}",route="{m.route}"}} {m.in_flight}'
+                  for m in self._routes.values()]
+
+        lines += ["# HELP thalya_request_errors_total Responses with a 5xx status or unhandled error",
+                  "# TYPE thalya_request_errors_total counter"]
+        lines += [f'thalya_request_errors_total{{kind="{m.kind}",route="{m.route}"}} {m.errors}'
+                  for m in self._routes.values()]
+
+        lines += ["# HELP thalya_voice_stage_seconds Time from utterance start to each pipeline stage",
+                  "# TYPE thalya_voice_stage_seconds histogram"]
+        for stage, histogram in self.voice_stages.items():
+            histogram.render('thalya_voice_stage_seconds', f'stage="{stage}"', lines)
+
+        lines += ["# HELP thalya_event_loop_lag_seconds Delay in waking a sleeping task",
+                  "# TYPE thalya_event_loop_lag_seconds histogram"]
+        self.loop_lag.render('thalya_event_loop_lag_seconds', '', lines)
+
+        if self.middleware_layers:
+            lines += ["# HELP thalya_middleware_seconds Time spent in a middleware layer and the layers inside it",
+                      "# TYPE thalya_middleware_seconds histogram"]
+            for name, histogram in self.middleware_layers.items():
+                histogram.render('thalya_middleware_seconds', f'layer="{name}"', lines)
+
+        if self.upstreams:
+            lines += ["# HELP thalya_upstream_request_seconds Outbound HTTP request duration per attempt",
+                      "# TYPE thalya_upstream_request_seconds histogram"]
+            for host, m in self.upstreams.items():
+                m.latency.render('thalya_upstream_request_seconds', f'host="{host}"', lines)
+            lines += ["# HELP thalya_upstream_errors_total Outbound attempts that failed or got a 5xx",
+                      "# TYPE thalya_upstream_errors_total counter"]
+            lines += [f'thalya_upstream_errors_total{{host="{host}"}} {m.errors}'
+                      for host, m in self.upstreams.items()]
+
+        stats = executor_stats()
+        lines += ["# HELP thalya_executor_queue_depth Jobs submitted but not finished",
+                  "# TYPE thalya_executor_queue_depth gauge",
+                  f'thalya_executor_queue_depth{{pool="cpu"}} {stats["cpu_queue_depth"]}',
+                  f'thalya_executor_queue_depth{{pool="io"}} {stats["io_queue_depth"]}']
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -1,63 +1,193 @@
-from typing import Optional
+from typing import Dict, List, Optional, Set
+import os
+import socket
 import time
 import asyncio
 from dataclasses import dataclass
 from config import settings
-from .message_queue import MessageQueue
+from .message_queue import message_bus
 import logging
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class RateLimit:
     requests: int
     window: int
     remaining: int
     reset_at: float
 
+class TimingWheel:
+    """Buckets keys by the second their window resets.
+
+    Expiry is lazy: a key whose window moved on since it was filed is simply
+    re-filed when its old slot comes round.
+    """
+    def __init__(self, span: int):
+        self._slots: List[Set[str]] = [set() for _ in range(span + 2)]
+        self._tick = int(time.time())
+
+    def _slot(self, at: float) -> Set[str]:
+        return self._slots[int(at) % len(self._slots)]
+
+    def add(self, key: str, at: float):
+        self._slot(at).add(key)
+
+    def advance(self, now: float) -> Set[str]:
+        """Empty every slot whose second has fully passed and return its keys"""
+        due: Set[str] = set()
+        target = int(now) - 1
+        # Idle longer than a full turn: every slot is due once
+        start = max(self._tick, target - len(self._slots) + 1)
+        for tick in range(start, target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if slot:
+                due |= slot
+                slot.clear()
+        self._tick = target + 1
+        return due
+
+    def pop_soonest(self) -> Optional[str]:
+        """Remove and return a key from the nearest non-empty slot"""
+        for offset in range(len(self._slots)):
+            slot = self._slots[(self._tick + offset) % len(self._slots)]
+            if slot:
+                return slot.pop()
+        return None
+
 class RateLimiter:
-    def __init__(self):
-        self._rate_limits = {}
-        self.message_queue = MessageQueue()
+    """Fixed-window limiter with a bounded key store.
+
+    Windows are expired through a timing wheel, and at most
+    RATE_LIMIT_MAX_KEYS are tracked: a new key beyond that evicts the one
+    whose window ends soonest. Usage is shared with other workers every
+    RATE_LIMIT_SYNC_INTERVAL as one batched 'rate_limits' event rather than
+    an event per request.
+    """
+    sync_batch = 1000
+
+    def __init__(self, max_keys: int = settings.RATE_LIMIT_MAX_KEYS,
+                 sync_interval: float = settings.RATE_LIMIT_SYNC_INTERVAL):
+        self._rate_limits: Dict[str, RateLimit] = {}
+        self._wheel = TimingWheel(settings.RATE_LIMIT_WINDOW)
+        self._usage: Dict[str, int] = {}
+        self.max_keys = max_keys
+        self.sync_interval = sync_interval
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self.evicted = 0
+        self.message_queue = message_bus
+        self._sync_task: Optional[asyncio.Task] = None
         self._setup_queue()
-        
+
     def _setup_queue(self):
         asyncio.create_task(self._init_queue())
-        
+
     async def _init_queue(self):
         await self.message_queue.create_queue('rate_limits')
         await self.message_queue.subscribe('rate_limits', self._handle_limit_update)
-        
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
     async def _handle_limit_update(self, data: dict):
-        key = data.get('key')
-        if key and key in self._rate_limits:
-            self._rate_limits[key].remaining = data['remaining']
-            self._rate_limits[key].reset_at = data['reset_at']
-            
+        if data.get('origin') == self.origin:
+            return
+        now = time.time()
+        for key, (used, reset_at) in data.get('usage', {}).items():
+            if reset_at <= now:
+                continue
+            limit = self._rate_limits.get(key) or self._track(key, now, reset_at)
+            limit.remaining = max(0, limit.remaining - used)
+
+    def _track(self, key: str, now: float, reset_at: Optional[float] = None) -> RateLimit:
+        if len(self._rate_limits) >= self.max_keys:
+            self._expire(now)
+        while len(self._rate_limits) >= self.max_keys:
+            # At the cap, give up the window that was about to end anyway
+            victim = self._wheel.pop_soonest()
+            if victim is None:
+                break
+            if self._rate_limits.pop(victim, None) is not None:
+                self.evicted += 1
+        limit = RateLimit(
+            requests=settings.RATE_LIMIT_REQUESTS,
+            window=settings.RATE_LIMIT_WINDOW,
+            remaining=settings.RATE_LIMIT_REQUESTS,
+            reset_at=reset_at or now + settings.RATE_LIMIT_WINDOW
+        )
+        self._rate_limits[key] = limit
+        self._wheel.add(key, limit.reset_at)
+        return limit
+
+    def _expire(self, now: float):
+        for key in self._wheel.advance(now):
+            limit = self._rate_limits.get(key)
+            if limit is None:
+                continue
+            if limit.reset_at <= now:
+                del self._rate_limits[key]
+            else:
+                self._wheel.add(key, limit.reset_at)
+
     async def check_rate_limit(self, key: str) -> Optional[RateLimit]:
         now = time.time()
-        
-        if key not in self._rate_limits:
-            self._rate_limits[key] = RateLimit(
-                requests=settings.RATE_LIMIT_REQUESTS,
-                window=settings.RATE_LIMIT_WINDOW,
-                remaining=settings.RATE_LIMIT_REQUESTS,
-                reset_at=now + settings.RATE_LIMIT_WINDOW
-            )
-            
-        limit = self._rate_limits[key]
-        
-        if now > limit.reset_at:
+        limit = self._rate_limits.get(key)
+
+        if limit is None:
+            limit = self._track(key, now)
+        elif now > limit.reset_at:
+            # The old slot re-files the key lazily when it comes round
             limit.remaining = limit.requests
             limit.reset_at = now + limit.window
-            
+
         if limit.remaining > 0:
             limit.remaining -= 1
-            await self.message_queue.publish('rate_limits', {
-                'key': key,
-                'remaining': limit.remaining,
-                'reset_at': limit.reset_at
-            })
+            self._usage[key] = self._usage.get(key, 0) + 1
             return None
-            
-        return limit
\ No newline at end of file
+
+        return limit
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.sync_interval)
+                now = time.time()
+                self._expire(now)
+                await self._sync()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Rate limit sync failed: {e}")
+
+    async def _sync(self):
+        if not self._usage:
+            return
+        usage, self._usage = self._usage, {}
+        batch = {}
+        for key, used in usage.items():
+            limit = self._rate_limits.get(key)
+            if limit is not None:
+                batch[key] = [used, limit.reset_at]
+            if len(batch) >= self.sync_batch:
+                await self._publish_usage(batch)
+                batch = {}
+        if batch:
+            await self._publish_usage(batch)
+
+    async def _publish_usage(self, batch: dict):
+        await self.message_queue.publish('rate_limits', {
+            'origin': self.origin,
+            'usage': batch
+        })
+
+    async def close(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            self._sync_task = None
+        await self.message_queue.unsubscribe('rate_limits', self._handle_limit_update)
+
+    def stats(self) -> dict:
+        return {
+            'tracked_keys': len(self._rate_limits),
+            'max_keys': self.max_keys,
+            'evicted': self.evicted,
+            'pending_sync': len(self._usage),
+        }
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from config import settings
+from .message_queue import MessageQueue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamSubscription:
+    queue_name: str
+    stream: str
+    group: str
+    handler: Callable
+    fanout: bool
+    task: Optional[asyncio.Task] = None
+
+
+class RedisStreamQueue(MessageQueue):
+    """``MessageQueue`` whose distributed topics travel over Redis Streams.
+
+    Topics listed in DISTRIBUTED_QUEUE_TOPICS are appended to a stream and
+    read back through consumer groups, so every worker process on every box
+    sees them. A subscriber without ``group`` gets a private group and
+    therefore every event; subscribers sharing ``group`` compete for events
+    across processes, and entries left pending by a dead consumer are
+    reclaimed after QUEUE_CLAIM_IDLE_MS. Payloads must be JSON serializable;
+    all other topics stay in process.
+
+    Private groups are destroyed on unsubscribe, but a crashed or redeployed
+    worker never gets there. The first subscription to each stream therefore
+    sweeps it: private groups whose consumers have all been idle for
+    QUEUE_GROUP_IDLE_MS are destroyed with their pending lists, and idle
+    consumers with nothing pending are dropped from shared groups. A live
+    consumer whose group was swept anyway recreates it.
+    """
+
+    def __init__(self, url: str = settings.REDIS_URL,
+                 topics: Optional[Iterable[str]] = None):
+        super().__init__()
+        self.redis = aioredis.from_url(url)
+        if topics is None:
+            topics = settings.DISTRIBUTED_QUEUE_TOPICS.split(',')
+        self.topics: Set[str] = {topic.strip() for topic in topics if topic.strip()}
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self._outbox: Dict[str, List[Tuple[bytes, float]]] = defaultdict(list)
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._subscriptions: Dict[str, Dict[Callable, StreamSubscription]] = defaultdict(dict)
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._swept: Set[str] = set()
+
+    def _stream(self, queue_name: str) -> str:
+        return f"{settings.QUEUE_STREAM_PREFIX}{queue_name}"
+
+    async def _create_group(self, stream: str, group: str):
+        try:
+            # Start at "$": a new subscriber only sees events from now on
+            await self.redis.xgroup_create(stream, group, id='$', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def sweep_stale_groups(self, stream: str,
+                                 max_idle_ms: int = settings.QUEUE_GROUP_IDLE_MS) -> int:
+        """Remove what dead workers left on ``stream``; returns groups destroyed"""
+        destroyed = 0
+        for info in await self.redis.xinfo_groups(stream):
+            group = info['name'].decode() if isinstance(info['name'], bytes) else info['name']
+            consumers = await self.redis.xinfo_consumers(stream, group)
+            stale = [c for c in consumers if c['idle'] >= max_idle_ms]
+            if group.startswith('fanout:'):
+                # A group with no consumers yet may belong to a worker that is just starting
+                if consumers and len(stale) == len(consumers):
+                    await self.redis.xgroup_destroy(stream, group)
+                    destroyed += 1
+                continue
+            for consumer in stale:
+                if not consumer['pending']:
+                    await self.redis.xgroup_delconsumer(stream, group, consumer['name'])
+        if destroyed:
+            logger.info(f"Removed {destroyed} stale consumer groups from {stream}")
+        return destroyed
+
+    async def publish(self, queue_name: str, message: Any) -> bool:
+        if queue_name not in self.topics:
+            return await super().publish(queue_name, message)
+        if self._closed:
+            return False
+        await self.create_queue(queue_name)
+
+        try:
+            payload = orjson.dumps(message)
+        except TypeError as e:
+            logger.error(f"Cannot publish non-serializable message on {queue_name}: {e}")
+            return False
+
+        # Everything published before the flusher wakes goes out in one pipeline
+        self._outbox[queue_name].append((payload, time.time()))
+        self._stats[queue_name].published += 1
+        self._ensure_flusher()
+        self._flush_wakeup.set()
+        return True
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flush_wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def _run_flusher(self):
+        while True:
+            try:
+                await self._flush_wakeup.wait()
+                self._flush_wakeup.clear()
+                await self._flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Stream flusher error: {e}")
+
+    async def _flush(self):
+        if not self._outbox:
+            return
+        outbox, self._outbox = self._outbox, defaultdict(list)
+        pipe = self.redis.pipeline(transaction=False)
+        for queue_name, entries in outbox.items():
+            for payload, published_at in entries:
+                pipe.xadd(
+                    self._stream(queue_name), {'d': payload, 't': published_at},
+                    maxlen=self._maxsize[queue_name], approximate=True
+                )
+        try:
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to append events to Redis: {e}")
+            for queue_name, entries in outbox.items():
+                self._stats[queue_name].dropped += len(entries)
+
+    async def subscribe(self, queue_name: str, handler: Callable, concurrency: int = 1,
+                        group: Optional[str] = None) -> None:
+        if queue_name not in self.topics:
+            return await super().subscribe(queue_name, handler, concurrency, group)
+        await self.create_queue(queue_name)
+        if handler in self._subscriptions[queue_name]:
+            return
+
+        sub = StreamSubscription(
+            queue_name=queue_name,
+            stream=self._stream(queue_name),
+            group=group or f"fanout:{self.consumer}:{next(self._group_ids)}",
+            handler=handler,
+            fanout=group is None,
+        )
+        await self._create_group(sub.stream, sub.group)
+        if sub.stream not in self._swept:
+            self._swept.add(sub.stream)
+            try:
+                await self.sweep_stale_groups(sub.stream)
+            except Exception as e:
+                logger.warning(f"Could not sweep stale consumer groups on {sub.stream}: {e}")
+        sub.task = asyncio.create_task(self._consume_stream(sub, max(1, concurrency)))
+        self._subscriptions[queue_name][handler] = sub
+
+    async def unsubscribe(self, queue_name: str, handler: Callable) -> None:
+        if queue_name not in self.topics:
+            return await super().unsubscribe(queue_name, handler)
+        sub = self._subscriptions[queue_name].pop(handler, None)
+        if sub:
+            await self._stop_subscription(sub)
+
+    async def _stop_subscription(self, sub: StreamSubscription):
+        sub.task.cancel()
+        await asyncio.gather(sub.task, return_exceptions=True)
+        if sub.fanout:
+            try:
+                await self.redis.xgroup_destroy(sub.stream, sub.group)
+            except Exception as e:
+                logger.warning(f"Could not remove consumer group {sub.group}: {e}")
+
+    async def _consume_stream(self, sub: StreamSubscription, concurrency: int) -> None:
+        slots = asyncio.Semaphore(concurrency)
+        claim_interval = settings.QUEUE_CLAIM_IDLE_MS / 1000
+        last_claim = 0.0
+        while True:
+            try:
+                entries = []
+                # Only shared groups can have pending entries from other consumers
+                if not sub.fanout and time.monotonic() - last_claim >= claim_interval:
+                    last_claim = time.monotonic()
+                    claimed = await self.redis.xautoclaim(
+                        sub.stream, sub.group, self.consumer,
+                        min_idle_time=settings.QUEUE_CLAIM_IDLE_MS,
+                        count=settings.QUEUE_BATCH_SIZE
+                    )
+                    entries = claimed[1]
+                if not entries:
+                    response = await self.redis.xreadgroup(
+                        sub.group, self.consumer, {sub.stream: '>'},
+                        count=settings.QUEUE_BATCH_SIZE, block=1000
+                    )
+                    entries = response[0][1] if response else []
+                if not entries:
+                    continue
+
+                done = await asyncio.gather(*(
+                    self._deliver(sub, entry_id, fields, slots) for entry_id, fields in entries
+                ))
+                acks = [entry_id for (entry_id, _), ok in zip(entries, done) if ok]
+                if acks:
+                    await self.redis.xack(sub.stream, sub.group, *acks)
+            except asyncio.CancelledError:
+                break
+            except ResponseError as e:
+                if 'NOGROUP' not in str(e):
+                    logger.error(f"Stream consumer error on {sub.stream}: {e}")
+                    await asyncio.sleep(settings.QUEUE_RETRY_DELAY)
+                    continue
+                # Swept by another worker (or the stream was deleted): start over
+                logger.warning(f"Consumer group {sub.group} vanished from {sub.stream}, recreating")
+                try:
+                    await self._create_group(sub.stream, sub.group)
+                except Exception as e:
+                    logger.error(f"Could not recreate consumer group {sub.group}: {e}")
+                    await asyncio.sleep(settings.QUEUE_RETRY_DELAY)
+            except Exception as e:
+                logger.error(f"Stream consumer error on {sub.stream}: {e}")
+                await asyncio.sleep(settings.QUEUE_RETRY_DELAY)
+
+    async def _deliver(self, sub: StreamSubscription, entry_id: bytes, fields: Optional[dict],
+                       slots: asyncio.Semaphore, retry_count: int = 0) -> bool:
+        """Run the handler once. False means a retry was scheduled and the entry stays pending."""
+        if not fields:
+            # Trimmed from the stream while pending
+            return True
+        stats = self._stats[sub.queue_name]
+        async with slots:
+            try:
+                data = orjson.loads(fields[b'd'])
+                stats.record_latency(max(0.0, time.time() - float(fields[b't'])))
+            except Exception as e:
+                stats.dropped += 1
+                logger.error(f"Discarding malformed event {entry_id!r} on {sub.stream}: {e}")
+                return True
+
+            try:
+                await sub.handler(data)
+                stats.processed += 1
+                return True
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"Error processing message: {e}")
+                if retry_count < settings.QUEUE_MAX_RETRIES:
+                    stats.retried += 1
+                    self._schedule_stream_retry(sub, entry_id, fields, slots, retry_count + 1)
+                    return False
+                stats.dropped += 1
+                return True
+
+    def _schedule_stream_retry(self, sub: StreamSubscription, entry_id: bytes, fields: dict,
+                               slots: asyncio.Semaphore, retry_count: int) -> None:
+        # The entry stays in the group's pending list until the retry settles,
+        # so if this process dies first another consumer can claim it
+        async def retry():
+            if await self._deliver(sub, entry_id, fields, slots, retry_count):
+                await self.redis.xack(sub.stream, sub.group, entry_id)
+
+        def start():
+            self._retry_handles.discard(handle)
+            task = asyncio.create_task(retry())
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+
+        handle = asyncio.get_running_loop().call_later(settings.QUEUE_RETRY_DELAY, start)
+        self._retry_handles.add(handle)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = super().get_stats()
+        for name, entry in stats.items():
+            if name in self.topics:
+                entry['backend'] = 'redis_stream'
+                entry['depth'] = len(self._outbox.get(name, ()))
+                entry['subscribers'] = len(self._subscriptions.get(name, {}))
+            else:
+                entry['backend'] = 'memory'
+        return stats
+
+    async def close(self, drain_timeout: float = 5.0) -> None:
+        self._closed = True
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self._flush()
+
+        for task in self._retry_tasks:
+            task.cancel()
+        subs = [sub for topic in self._subscriptions.values() for sub in topic.values()]
+        await asyncio.gather(*(self._stop_subscription(sub) for sub in subs),
+                             return_exceptions=True)
+        self._subscriptions.clear()
+
+        await super().close(drain_timeout)
+        await self.redis.close()
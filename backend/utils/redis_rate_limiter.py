@@ -0,0 +1,133 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# GCRA in one round trip. The key holds the theoretical arrival time (TAT)
+# in milliseconds of server time, so every worker agrees on the clock and a
+# key costs one string no matter how much traffic it sees.
+#   ARGV[1] emission interval (ms per request), ARGV[2] burst (requests)
+# Returns {allowed, remaining, reset_ms, retry_after_ms}.
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission
+local allow_at = new_tat - burst * emission
+if now < allow_at then
+    return {0, 0, tat - now, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / emission), new_tat - now, 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the limit is fully replenished
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(int(-(-self.reset_after // 1))),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, int(-(-self.retry_after // 1))))
+        return headers
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RedisRateLimiter:
+    """Cluster-wide GCRA limiter with an in-process token bucket in front.
+
+    The local bucket has the same rate and burst as the shared limit, so a
+    key it rejects is over the limit from this process alone and Redis is
+    not consulted. If Redis is unreachable the local bucket decides instead
+    of letting everything through.
+    """
+
+    def __init__(self, redis, key_prefix: str = "rate_limit:",
+                 limit: int = settings.RATE_LIMIT_REQUESTS,
+                 window: int = settings.RATE_LIMIT_WINDOW,
+                 max_local_keys: int = settings.RATE_LIMIT_LOCAL_KEYS):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.limit = limit
+        self.window = window
+        self.rate = limit / window
+        self.max_local_keys = max_local_keys
+        self._emission_ms = max(1, round(window * 1000 / limit))
+        self._script = redis.register_script(GCRA_SCRIPT)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._metrics = {'allowed': 0, 'rejected_local': 0, 'rejected_remote': 0, 'errors': 0}
+
+    def _take_local(self, key: str, now: float) -> RateLimitResult:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(float(self.limit), now)
+            if len(self._buckets) > self.max_local_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.limit, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens < 1:
+            return RateLimitResult(False, self.limit, 0, (self.limit - bucket.tokens) / self.rate,
+                                   retry_after=(1 - bucket.tokens) / self.rate)
+        bucket.tokens -= 1
+        return RateLimitResult(True, self.limit, int(bucket.tokens),
+                               (self.limit - bucket.tokens) / self.rate)
+
+    async def check(self, key: str, scope: dict) -> RateLimitResult:
+        key = f"{self.key_prefix}{key}:{scope['path']}"
+        local = self._take_local(key, time.monotonic())
+        if not local.allowed:
+            self._metrics['rejected_local'] += 1
+            return local
+
+        try:
+            allowed, remaining, reset_ms, retry_ms = await self._script(
+                keys=[key], args=[self._emission_ms, self.limit]
+            )
+        except Exception as e:
+            self._metrics['errors'] += 1
+            logger.warning(f"Rate limiter falling back to local bucket: {e}")
+            self._metrics['allowed'] += 1
+            return local
+
+        result = RateLimitResult(bool(allowed), self.limit, int(remaining),
+                                 reset_ms / 1000, retry_ms / 1000)
+        self._metrics['allowed' if result.allowed else 'rejected_remote'] += 1
+        return result
+
+    async def is_allowed(self, key: str, scope: dict) -> bool:
+        return (await self.check(key, scope)).allowed
+
+    def stats(self) -> dict:
+        return {**self._metrics, 'local_keys': len(self._buckets)}
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import unquote_plus
+
+import orjson
+from redis import asyncio as aioredis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SUSPICIOUS_PATTERNS = (
+    r'\.\./',
+    r'exec\(',
+    r'eval\(',
+    r'(?:union|select|insert|delete|drop)\s+(?:from|into|table)',
+)
+
+
+class RequestScreener:
+    """Matches request paths and query strings against every pattern at once.
+
+    The patterns are merged into one alternation compiled up front, so a
+    request costs one scan of the path and, only if that is clean, one of
+    the decoded query string. Text is lowercased before matching rather
+    than compiling with IGNORECASE, which is several times slower in
+    ``re``; patterns must therefore be written in lowercase.
+    """
+
+    def __init__(self, patterns: Iterable[str] = SUSPICIOUS_PATTERNS):
+        self.patterns = tuple(patterns)
+        self._search = re.compile('|'.join(f'(?:{pattern})' for pattern in self.patterns)).search
+
+    def screen(self, path: str, query_string: bytes = b'') -> Optional[str]:
+        """The first suspicious fragment found, or None"""
+        match = self._search(path.lower())
+        if match is None and query_string:
+            # ASGI hands over the path decoded but the query string raw
+            query = query_string.decode('latin-1')
+            if b'%' in query_string or b'+' in query_string:
+                query = unquote_plus(query)
+            match = self._search(query.lower())
+        return match.group() if match else None
+
+
+class DecayingCounter:
+    """Per-key request scores that halve every ``half_life`` seconds.
+
+    At most ``max_keys`` keys are kept; the least recently seen is dropped
+    first, which only ever forgets the quietest clients.
+    """
+
+    def __init__(self, max_keys: int = settings.SECURITY_MAX_TRACKED_IPS,
+                 half_life: float = settings.SECURITY_DECAY_HALF_LIFE):
+        self.max_keys = max_keys
+        self._decay = math.log(2) / half_life
+        self._scores: "OrderedDict[str, list]" = OrderedDict()
+
+    def hit(self, key: str, weight: float = 1.0, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        entry = self._scores.get(key)
+        if entry is None:
+            entry = self._scores[key] = [0.0, now]
+            if len(self._scores) > self.max_keys:
+                self._scores.popitem(last=False)
+        else:
+            self._scores.move_to_end(key)
+        entry[0] = entry[0] * math.exp(self._decay * (entry[1] - now)) + weight
+        entry[1] = now
+        return entry[0]
+
+    def forget(self, key: str):
+        self._scores.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class SharedBlocklist:
+    """Blocked IPs shared by every worker.
+
+    Lookups hit a local dict of ip -> expiry. Blocks are written to a Redis
+    sorted set scored by expiry and announced on a pub/sub channel; each
+    worker applies announcements as they arrive and reloads the whole set
+    whenever its subscription (re)connects, so nothing is missed across
+    restarts.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL,
+                 key: str = settings.SECURITY_BLOCKLIST_KEY,
+                 block_ttl: int = settings.SECURITY_BLOCK_TTL):
+        self.redis = aioredis.from_url(redis_url)
+        self.key = key
+        self.channel = key
+        self.block_ttl = block_ttl
+        self._blocked: Dict[str, float] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def is_blocked(self, ip: str) -> bool:
+        expires_at = self._blocked.get(ip)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._blocked[ip]
+            return False
+        return True
+
+    def _mark(self, ip: str, ttl: Optional[int]) -> float:
+        expires_at = self._blocked[ip] = time.time() + (ttl or self.block_ttl)
+        return expires_at
+
+    def block_soon(self, ip: str, ttl: Optional[int] = None):
+        """Block locally now and share in the background, for use on the request path"""
+        task = asyncio.create_task(self._share(ip, self._mark(ip, ttl)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def block(self, ip: str, ttl: Optional[int] = None):
+        await self._share(ip, self._mark(ip, ttl))
+
+    async def _share(self, ip: str, expires_at: float):
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(self.key, {ip: expires_at})
+                pipe.publish(self.channel, orjson.dumps({'ip': ip, 'expires_at': expires_at}))
+                await pipe.execute()
+            logger.warning(f"Blocked {ip} until {expires_at:.0f}")
+        except Exception as e:
+            logger.error(f"Failed to share block of {ip}: {e}")
+
+    async def unblock(self, ip: str):
+        self._blocked.pop(ip, None)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(self.key, ip)
+            pipe.publish(self.channel, orjson.dumps({'ip': ip, 'expires_at': 0}))
+            await pipe.execute()
+
+    async def reload(self):
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(self.key, '-inf', now)
+            pipe.zrangebyscore(self.key, now, '+inf', withscores=True)
+            _, entries = await pipe.execute()
+        self._blocked = {
+            (ip.decode() if isinstance(ip, bytes) else ip): expires_at for ip, expires_at in entries
+        }
+
+    def _apply(self, update: dict):
+        if update['expires_at'] > time.time():
+            self._blocked[update['ip']] = update['expires_at']
+        else:
+            self._blocked.pop(update['ip'], None)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                await self.reload()
+                async for message in pubsub.listen():
+                    self._apply(orjson.loads(message['data']))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Blocklist listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, *self._pending, return_exceptions=True)
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {'blocked': len(self._blocked), 'listening': self._listener is not None}
+
+
+ip_blocklist = SharedBlocklist()
@@ -0,0 +1,313 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Union
+
+from config import settings
+from .executors import run_io
+
+logger = logging.getLogger(__name__)
+
+CREATION_RATE_WINDOW = 60.0  # seconds covered by creations_per_sec
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PooledResource:
+    __slots__ = ('resource', 'created_at', 'last_used')
+
+    def __init__(self, resource: Any):
+        self.resource = resource
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ResourcePool:
+    """Bounded async pool of reusable resources.
+
+    ``factory`` may be a coroutine function, or a plain callable that is run
+    on the I/O thread pool when ``blocking_factory`` is set. Idle resources
+    are handed out most recently used first and checked on borrow: anything
+    older than ``max_age`` is recycled and ``validate`` (sync or async) can
+    reject the rest. A maintenance task evicts resources idle for longer
+    than ``idle_timeout`` down to ``min_size`` and keeps that many warm.
+
+    Callers that find the pool exhausted queue in FIFO order, and a released
+    resource goes straight to the oldest of them, so newcomers can never
+    overtake a waiter.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Union[Any, Awaitable[Any]]],
+                 min_size: int = settings.POOL_MIN_SIZE,
+                 max_size: int = settings.CLIENT_POOL_MAX_SIZE,
+                 max_age: float = settings.POOL_MAX_AGE,
+                 idle_timeout: float = settings.POOL_IDLE_TIMEOUT,
+                 acquire_timeout: float = settings.POOL_ACQUIRE_TIMEOUT,
+                 validate: Optional[Callable[[Any], Union[bool, Awaitable[bool]]]] = None,
+                 close: Optional[Callable[[Any], Any]] = None,
+                 blocking_factory: bool = False,
+                 maintenance_interval: float = settings.POOL_CLEANUP_INTERVAL):
+        self.name = name
+        self._factory = factory
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.maintenance_interval = maintenance_interval
+        self._validate = validate
+        self._close_resource = close
+        self._blocking_factory = blocking_factory
+        self._idle: Deque[PooledResource] = deque()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._size = 0
+        self._closed = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._creations: Deque[float] = deque()
+        self._metrics = {
+            'acquired': 0,
+            'created': 0,
+            'recycled': 0,
+            'evicted_idle': 0,
+            'discarded': 0,
+            'validation_failures': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    async def start(self):
+        await self._fill(self.min_size - self._size)
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        self._closed = True
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_exception(RuntimeError(f"Pool {self.name} is closed"))
+        self._waiters.clear()
+        while self._idle:
+            self._destroy(self._idle.pop())
+
+    async def _create(self) -> PooledResource:
+        self._size += 1
+        return await self._build()
+
+    async def _build(self) -> PooledResource:
+        """Create a resource for a slot already counted in ``_size``"""
+        try:
+            if self._blocking_factory:
+                resource = await run_io(self._factory)
+            else:
+                resource = self._factory()
+                if inspect.isawaitable(resource):
+                    resource = await resource
+        except Exception:
+            self._size -= 1
+            raise
+        now = time.monotonic()
+        self._metrics['created'] += 1
+        self._creations.append(now)
+        while self._creations[0] < now - CREATION_RATE_WINDOW:
+            self._creations.popleft()
+        return PooledResource(resource)
+
+    async def _fill(self, count: int):
+        """Create ``count`` resources for the idle set or the waiters"""
+        if count <= 0:
+            return
+        # Reserved up front so a concurrent acquire() can't claim the same capacity
+        self._size += count
+        await asyncio.gather(*(self._add_reserved() for _ in range(count)))
+
+    async def _add_reserved(self):
+        try:
+            entry = await self._build()
+        except Exception as e:
+            logger.error(f"Failed to create {self.name} resource: {e}")
+            # Whoever was next in line gets the error instead of waiting out the timeout
+            if self._queued():
+                self._waiters.popleft().set_exception(e)
+            return
+        if self._closed:
+            self._destroy(entry)
+        else:
+            self._put(entry)
+
+    def _destroy(self, entry: PooledResource):
+        self._size -= 1
+        resource = entry.resource
+        close = (
+            (lambda: self._close_resource(resource)) if self._close_resource else
+            getattr(resource, 'close', None) or getattr(getattr(resource, 'transport', None), 'close', None)
+        )
+        if close:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.debug(f"Error closing {self.name} resource: {e}")
+
+    async def _is_usable(self, entry: PooledResource) -> bool:
+        if time.monotonic() - entry.created_at > self.max_age:
+            self._metrics['recycled'] += 1
+            return False
+        if self._validate is not None:
+            try:
+                valid = self._validate(entry.resource)
+                if inspect.isawaitable(valid):
+                    valid = await valid
+            except Exception:
+                valid = False
+            if not valid:
+                self._metrics['validation_failures'] += 1
+                return False
+        return True
+
+    def _queued(self) -> bool:
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        return bool(self._waiters)
+
+    def _put(self, entry: PooledResource):
+        """Hand ``entry`` to the oldest waiter, or park it as idle"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(entry)
+                return
+        entry.last_used = time.monotonic()
+        self._idle.append(entry)
+
+    async def _wait(self, deadline: float) -> PooledResource:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, max(deadline - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            self._metrics['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for {self.name} resource"
+            )
+        except asyncio.CancelledError:
+            # Handed a resource just as the caller went away: pass it on
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._put(waiter.result())
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+
+    async def acquire(self) -> PooledResource:
+        if self._closed:
+            raise RuntimeError(f"Pool {self.name} is closed")
+
+        start = time.perf_counter()
+        deadline = start + self.acquire_timeout
+        while True:
+            if self._idle:
+                entry = self._idle.pop()
+                if await self._is_usable(entry):
+                    break
+                self._destroy(entry)
+                if self._idle:
+                    continue
+            elif self._size >= self.max_size or self._queued():
+                # Capacity goes to earlier callers first
+                entry = await self._wait(deadline)
+                if await self._is_usable(entry):
+                    break
+                self._destroy(entry)
+            # Either there was room, or this caller just freed the slot it
+            # was handed and replaces the resource rather than queueing again
+            entry = await self._create()
+            break
+
+        waited = time.perf_counter() - start
+        self._metrics['acquired'] += 1
+        self._metrics['wait_time_total'] += waited
+        self._metrics['wait_time_max'] = max(self._metrics['wait_time_max'], waited)
+        return entry
+
+    def release(self, entry: PooledResource, discard: bool = False):
+        if discard or self._closed:
+            if discard:
+                self._metrics['discarded'] += 1
+            self._destroy(entry)
+            # Freed capacity must reach callers already queued
+            if not self._closed and self._queued():
+                # Reserved before any newcomer can see the freed slot
+                self._size += 1
+                asyncio.create_task(self._add_reserved())
+            return
+        self._put(entry)
+
+    @asynccontextmanager
+    async def borrow(self):
+        entry = await self.acquire()
+        discard = False
+        try:
+            yield entry.resource
+        except Exception:
+            # A failing resource may be in a broken state; never hand it out again
+            discard = True
+            raise
+        finally:
+            self.release(entry, discard=discard)
+
+    def evict(self) -> int:
+        """Drop idle resources past ``max_age`` or ``idle_timeout``, keeping ``min_size``"""
+        now = time.monotonic()
+        evicted = 0
+        keep: Deque[PooledResource] = deque()
+        # Oldest-used first, so the least useful go before the floor is hit
+        while self._idle:
+            entry = self._idle.popleft()
+            if now - entry.created_at > self.max_age:
+                self._metrics['recycled'] += 1
+            elif now - entry.last_used > self.idle_timeout and self._size > self.min_size:
+                self._metrics['evicted_idle'] += 1
+            else:
+                keep.append(entry)
+                continue
+            self._destroy(entry)
+            evicted += 1
+        self._idle = keep
+        return evicted
+
+    async def _maintain(self):
+        while not self._closed:
+            try:
+                await asyncio.sleep(self.maintenance_interval)
+                self.evict()
+                await self._fill(self.min_size - self._size)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Pool {self.name} maintenance error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        idle = len(self._idle)
+        acquired = self._metrics['acquired']
+        now = time.monotonic()
+        recent = sum(1 for created_at in self._creations if created_at >= now - CREATION_RATE_WINDOW)
+        return {
+            'size': self._size,
+            'idle': idle,
+            'in_use': self._size - idle,
+            'waiting': sum(1 for waiter in self._waiters if not waiter.done()),
+            'max_size': self.max_size,
+            **{k: v for k, v in self._metrics.items() if not k.startswith('wait_time')},
+            'avg_wait_ms': round(self._metrics['wait_time_total'] / acquired * 1000, 2) if acquired else 0.0,
+            'max_wait_ms': round(self._metrics['wait_time_max'] * 1000, 2),
+            'creations_per_sec': round(recent / CREATION_RATE_WINDOW, 3),
+        }
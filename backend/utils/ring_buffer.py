@@ -0,0 +1,145 @@
+import asyncio
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from config import settings
+
+BytesLike = Union[bytes, bytearray, memoryview, np.ndarray]
+
+DROP_OLDEST = 'drop_oldest'
+BACKPRESSURE = 'backpressure'
+
+
+class BufferOverflowError(Exception):
+    pass
+
+
+class AudioRingBuffer:
+    """Fixed-capacity byte ring backed by a preallocated NumPy array.
+
+    Reads hand out memoryviews into the backing storage, so they are only
+    valid until the next write or consume. The ring is not thread-safe;
+    callers that share it across threads must hold their own lock.
+
+    On overflow, ``drop_oldest`` discards the oldest bytes to make room while
+    ``backpressure`` refuses the write (``write``) or waits for the reader to
+    drain below the high-water mark (``put``).
+    """
+
+    def __init__(self, capacity: int = settings.AUDIO_MAX_BUFFER_BYTES,
+                 high_water: Optional[int] = None,
+                 overflow: str = DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, BACKPRESSURE):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.capacity = capacity
+        self.high_water = high_water if high_water is not None else int(capacity * 0.8)
+        self.overflow = overflow
+        self._buf = np.zeros(capacity, dtype=np.uint8)
+        self._view = memoryview(self._buf)
+        self._scratch: Optional[np.ndarray] = None
+        self._start = 0
+        self._size = 0
+        self._drained: Optional[asyncio.Event] = None
+        self.dropped_bytes = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    @property
+    def above_high_water(self) -> bool:
+        return self._size >= self.high_water
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self._notify_drained()
+
+    def write(self, data: BytesLike) -> int:
+        src = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) \
+            else data.reshape(-1).view(np.uint8)
+        n = len(src)
+        if n > self.free:
+            if self.overflow == BACKPRESSURE:
+                raise BufferOverflowError(
+                    f"Ring buffer full ({self._size}/{self.capacity} bytes)"
+                )
+            if n >= self.capacity:
+                # Only the newest ``capacity`` bytes can survive
+                self.dropped_bytes += self._size + n - self.capacity
+                src = src[n - self.capacity:]
+                n = self.capacity
+                self._start = 0
+                self._size = 0
+            else:
+                self._advance(n - self.free, dropped=True)
+
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._buf[end:end + first] = src[:first]
+        if first < n:
+            self._buf[:n - first] = src[first:]
+        self._size += n
+        return n
+
+    async def put(self, data: BytesLike) -> int:
+        """Write, waiting for the reader to drain below high water when applying backpressure"""
+        if self.overflow == BACKPRESSURE:
+            while self._size and self._size + len(data) > self.high_water:
+                if self._drained is None:
+                    self._drained = asyncio.Event()
+                self._drained.clear()
+                await self._drained.wait()
+        return self.write(data)
+
+    def views(self, n: Optional[int] = None) -> Tuple[memoryview, ...]:
+        """Zero-copy views over the oldest ``n`` bytes (two views when wrapped)"""
+        n = self._size if n is None else min(n, self._size)
+        first = min(n, self.capacity - self._start)
+        head = self._view[self._start:self._start + first]
+        if first == n:
+            return (head,)
+        return head, self._view[:n - first]
+
+    def peek(self, n: Optional[int] = None) -> memoryview:
+        """Contiguous view over the oldest ``n`` bytes without consuming them.
+
+        Zero-copy unless the region wraps, in which case it is assembled in a
+        scratch array that is allocated once and reused.
+        """
+        parts = self.views(n)
+        if len(parts) == 1:
+            return parts[0]
+        if self._scratch is None:
+            self._scratch = np.empty(self.capacity, dtype=np.uint8)
+        head, tail = parts
+        self._scratch[:len(head)] = head
+        self._scratch[len(head):len(head) + len(tail)] = tail
+        return memoryview(self._scratch)[:len(head) + len(tail)]
+
+    def consume(self, n: int):
+        self._advance(min(n, self._size))
+        self._notify_drained()
+
+    def read(self, n: Optional[int] = None) -> bytes:
+        """Copy out and consume the oldest ``n`` bytes"""
+        parts = self.views(n)
+        data = b''.join(parts)
+        self.consume(len(data))
+        return data
+
+    def _advance(self, n: int, dropped: bool = False):
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        if dropped:
+            self.dropped_bytes += n
+        if self._size == 0:
+            self._start = 0
+
+    def _notify_drained(self):
+        if self._drained is not None and self._size < self.high_water:
+            self._drained.set()
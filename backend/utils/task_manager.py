@@ -2,7 +2,7 @@ import asyncio
 from typing import Dict, Callable, Any, Optional
 import logging
 from datetime import datetime
-from .message_queue import MessageQueue
+from .message_queue import message_bus
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +10,7 @@ class TaskManager:
     def __init__(self):
         self.tasks: Dict[str, asyncio.Task] = {}
         self.last_run: Dict[str, datetime] = {}
-        self.message_queue = MessageQueue()
+        self.message_queue = message_bus
         asyncio.create_task(self._setup_task_queue())
         
     async def start_task(self, name: str, coro: Callable, *args, **kwargs) -> None:
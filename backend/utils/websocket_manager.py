@@ -1,83 +1,226 @@
-from typing import Dict, Set, Optional
+from typing import Dict, Iterable, Optional, Set
 import asyncio
-import json
-from dataclasses import dataclass
-from datetime import datetime
+import math
+import time
 import logging
-from .message_queue import MessageQueue
+from collections import deque
+import orjson
+from config import settings
+from .connection_lifecycle import ConnectionRecord, connection_lifecycle
+from .message_queue import message_bus
+from .performance_monitor import HTTP_BUCKETS, Histogram
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class WebSocketConnection:
-    id: str
-    connected_at: datetime
-    last_ping: datetime
-    ping_interval: float = 30.0
-    
-class WebSocketManager:
+SLOW_CONSUMER_POLICIES = ('drop_oldest', 'disconnect')
+
+class WebSocketConnection(ConnectionRecord):
+    __slots__ = ('outbox', 'flusher', 'groups', 'dropped')
+
+    def __init__(self, id: str, websocket, owner):
+        super().__init__(id, websocket, owner)
+        self.outbox: deque = deque()
+        self.flusher: Optional[asyncio.Task] = None
+        self.groups: Set[str] = set()
+        self.dropped = 0
+
+    @property
+    def websocket(self):
+        return self.transport
+
+class GroupStats:
+    __slots__ = ('sent', 'dropped', 'disconnected', 'latency')
+
     def __init__(self):
+        self.sent = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.latency = Histogram(HTTP_BUCKETS)  # enqueue to send completed
+
+    def as_dict(self) -> dict:
+        return {
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'disconnected': self.disconnected,
+            'latency_p50': self.latency.quantile(0.5),
+            'latency_p99': self.latency.quantile(0.99),
+        }
+
+class WebSocketManager:
+    """Tracks websockets by id and group.
+
+    Heartbeats run on the worker's shared ``connection_lifecycle`` instead of
+    a task per socket; a socket that fails a ping is unregistered. Sockets
+    are not dropped for being quiet unless ``idle_timeout`` is set.
+
+    Outgoing messages are serialized once and appended to each recipient's
+    bounded outbox, so a broadcast never waits on a socket. A connection
+    only has a flusher task while its outbox is non-empty, and at most
+    ``send_concurrency`` sends are in flight across the manager. When an
+    outbox is full the slow consumer either loses its oldest message
+    ('drop_oldest') or is disconnected ('disconnect').
+    """
+    def __init__(self, ping_interval: float = settings.WEBSOCKET_PING_INTERVAL,
+                 idle_timeout: float = math.inf,
+                 max_queue: int = settings.WEBSOCKET_SEND_QUEUE,
+                 slow_consumer_policy: str = settings.WEBSOCKET_SLOW_CONSUMER_POLICY,
+                 send_concurrency: int = settings.WEBSOCKET_SEND_CONCURRENCY,
+                 send_timeout: float = settings.WEBSOCKET_SEND_TIMEOUT):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy {slow_consumer_policy!r}")
         self.connections: Dict[str, WebSocketConnection] = {}
         self.groups: Dict[str, Set[str]] = {}
-        self.message_queue = MessageQueue()
-        asyncio.create_task(self._setup_queues())
-        
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        self._send_slots = asyncio.Semaphore(send_concurrency)
+        self._group_stats: Dict[str, GroupStats] = {}
+        self.lifecycle = connection_lifecycle
+        self.message_queue = message_bus
+
+    async def start(self):
+        await self._setup_queues()
+
     async def register(self, conn_id: str, websocket) -> WebSocketConnection:
-        connection = WebSocketConnection(
-            id=conn_id,
-            connected_at=datetime.now(),
-            last_ping=datetime.now()
-        )
+        connection = WebSocketConnection(conn_id, websocket, self)
         self.connections[conn_id] = connection
-        
-        asyncio.create_task(self._ping_connection(conn_id, websocket))
+        self.lifecycle.add(connection)
         return connection
-        
-    async def _ping_connection(self, conn_id: str, websocket):
-        while conn_id in self.connections:
-            try:
-                await websocket.send_json({'type': 'ping'})
-                await asyncio.sleep(self.connections[conn_id].ping_interval)
-            except Exception:
-                await self.unregister(conn_id)
-                break
-                
+
+    def touch(self, conn_id: str):
+        connection = self.connections.get(conn_id)
+        if connection is not None:
+            connection.touch()
+
+    async def heartbeat(self, connection: WebSocketConnection):
+        await connection.websocket.send_json({'type': 'ping'})
+
+    async def expire(self, connection: WebSocketConnection):
+        await self.unregister(connection.id)
+
     async def unregister(self, conn_id: str):
-        if conn_id in self.connections:
-            del self.connections[conn_id]
-            logger.info(f"Connection {conn_id} unregistered")
-            
+        self._forget(conn_id)
+
+    def _forget(self, conn_id: str):
+        connection = self.connections.pop(conn_id, None)
+        if connection is None:
+            return
+        self.lifecycle.discard(connection)
+        for group in list(connection.groups):
+            self.remove_from_group(conn_id, group)
+        connection.outbox.clear()
+        if connection.flusher is not None and connection.flusher is not asyncio.current_task():
+            connection.flusher.cancel()
+        logger.info(f"Connection {conn_id} unregistered")
+
+    def _stats_for(self, group: Optional[str]) -> Optional[GroupStats]:
+        if group is None:
+            return None
+        stats = self._group_stats.get(group)
+        if stats is None:
+            stats = self._group_stats[group] = GroupStats()
+        return stats
+
+    def _enqueue(self, connection: WebSocketConnection, payload: str, group: Optional[str] = None):
+        outbox = connection.outbox
+        if len(outbox) >= self.max_queue:
+            stats = self._stats_for(group)
+            if self.slow_consumer_policy == 'disconnect':
+                if stats:
+                    stats.disconnected += 1
+                logger.warning(f"Disconnecting slow consumer {connection.id} ({len(outbox)} queued)")
+                self._forget(connection.id)
+                asyncio.create_task(self._close(connection, 1013))
+                return
+            _, dropped_group, _ = outbox.popleft()
+            connection.dropped += 1
+            if dropped_group is not None:
+                self._stats_for(dropped_group).dropped += 1
+        outbox.append((payload, group, time.monotonic()))
+        if connection.flusher is None:
+            connection.flusher = asyncio.create_task(self._flush(connection))
+
+    async def _flush(self, connection: WebSocketConnection):
+        try:
+            while connection.outbox:
+                payload, group, enqueued_at = connection.outbox.popleft()
+                async with self._send_slots:
+                    await asyncio.wait_for(connection.websocket.send(payload), self.send_timeout)
+                if group is not None:
+                    stats = self._stats_for(group)
+                    stats.sent += 1
+                    stats.latency.observe(time.monotonic() - enqueued_at)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to send message to {connection.id}: {e}")
+            await self.unregister(connection.id)
+        finally:
+            connection.flusher = None
+
+    async def _close(self, connection: WebSocketConnection, code: int):
+        try:
+            await connection.websocket.close(code)
+        except Exception:
+            pass
+
     async def send_to_connection(self, conn_id: str, message: Dict):
-        if conn_id in self.connections:
-            try:
-                await self.connections[conn_id].websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Failed to send message to {conn_id}: {e}")
-                await self.unregister(conn_id)
-                
+        connection = self.connections.get(conn_id)
+        if connection is not None:
+            self._enqueue(connection, orjson.dumps(message).decode())
+
     async def broadcast(self, group: str, message: Dict):
-        if group in self.groups:
-            for conn_id in self.groups[group]:
-                await self.send_to_connection(conn_id, message)
-                
+        await self.broadcast_groups((group,), message)
+
+    async def broadcast_groups(self, groups: Iterable[str], message: Dict):
+        """Serialize ``message`` once and queue it for every member of ``groups``"""
+        payload = None
+        for group in groups:
+            members = self.groups.get(group)
+            if not members:
+                continue
+            if payload is None:
+                payload = orjson.dumps(message).decode()
+            # Copied: a slow consumer can be dropped from the group mid-loop
+            for conn_id in tuple(members):
+                connection = self.connections.get(conn_id)
+                if connection is not None:
+                    self._enqueue(connection, payload, group)
+
     def add_to_group(self, conn_id: str, group: str):
         if group not in self.groups:
             self.groups[group] = set()
         self.groups[group].add(conn_id)
-        
+        connection = self.connections.get(conn_id)
+        if connection is not None:
+            connection.groups.add(group)
+
     def remove_from_group(self, conn_id: str, group: str):
         if group in self.groups and conn_id in self.groups[group]:
             self.groups[group].remove(conn_id)
             if not self.groups[group]:
                 del self.groups[group]
-                
+                self._group_stats.pop(group, None)
+        connection = self.connections.get(conn_id)
+        if connection is not None:
+            connection.groups.discard(group)
+
+    def stats(self) -> dict:
+        return {
+            'connections': len(self.connections),
+            'queued': sum(len(connection.outbox) for connection in self.connections.values()),
+            'groups': {group: stats.as_dict() for group, stats in self._group_stats.items()},
+        }
+
     async def _setup_queues(self):
         await self.message_queue.create_queue('websocket_events')
         await self.message_queue.subscribe('websocket_events', self._handle_event)
-        
+
     async def _handle_event(self, event_data: Dict):
         event_type = event_data.get('type')
         if event_type == 'broadcast':
             await self.broadcast(event_data['group'], event_data['message'])
         elif event_type == 'direct':
-            await self.send_to_connection(event_data['conn_id'], event_data['message'])
\ No newline at end of file
+            await self.send_to_connection(event_data['conn_id'], event_data['message'])
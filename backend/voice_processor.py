@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from google.cloud import speech_v1
+from google.cloud import texttospeech
+
+from tts_cache import TTSCache
+from utils.executors import run_io
+from utils.performance_monitor import metrics
+
+logger = logging.getLogger(__name__)
+
+# Split after terminal punctuation followed by whitespace; keeps the punctuation
+# with the sentence so TTS prosody stays natural.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…;:])\s+')
+MIN_SENTENCE_CHARS = 12
+
+
+class SentenceSplitter:
+    """Accumulates streamed LLM text and releases complete sentences."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self._pending = ""
+        self._min_chars = min_chars
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        parts = SENTENCE_BOUNDARY.split(self._pending)
+        if len(parts) == 1:
+            return []
+
+        # Last part has no boundary after it yet
+        self._pending = parts.pop()
+        sentences = []
+        carry = ""
+        for part in parts:
+            carry = f"{carry} {part}".strip() if carry else part.strip()
+            # Merge very short fragments ("Oui.", "D'accord.") into the next one
+            if len(carry) >= self._min_chars:
+                sentences.append(carry)
+                carry = ""
+        if carry:
+            self._pending = f"{carry} {self._pending}"
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        remainder = self._pending.strip()
+        self._pending = ""
+        return remainder or None
+
+
+class ContextChat:
+    """A Gemini chat session with ``context`` as its system prompt.
+
+    google-generativeai 0.3.1 has no ``system_instruction``, so the prompt
+    is sent as an opening user/model exchange. ``history`` leaves that
+    exchange out, so it can be stored and passed back in on the next turn.
+    """
+
+    def __init__(self, model, context: str, history: List):
+        self._preamble = [
+            {'role': 'user', 'parts': [context]},
+            {'role': 'model', 'parts': ["Understood."]},
+        ] if context else []
+        self.session = model.start_chat(history=self._preamble + list(history))
+
+    async def send(self, text: str, **kwargs):
+        return await self.session.send_message_async(text, **kwargs)
+
+    @property
+    def history(self) -> List:
+        return self.session.history[len(self._preamble):]
+
+
+@dataclass
+class StageTimings:
+    """Monotonic timestamps for each stage of a voice turn."""
+    started: float = field(default_factory=time.perf_counter)
+    stt_done: Optional[float] = None
+    llm_first_token: Optional[float] = None
+    first_sentence: Optional[float] = None
+    first_audio: Optional[float] = None
+    completed: Optional[float] = None
+    sentences: int = 0
+
+    def mark(self, stage: str) -> None:
+        if getattr(self, stage) is None:
+            setattr(self, stage, time.perf_counter())
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        def ms(ts: Optional[float]) -> Optional[float]:
+            return round((ts - self.started) * 1000, 1) if ts is not None else None
+
+        return {
+            'stt_ms': ms(self.stt_done),
+            'llm_first_token_ms': ms(self.llm_first_token),
+            'first_sentence_ms': ms(self.first_sentence),
+            'time_to_first_audio_ms': ms(self.first_audio),
+            'total_ms': ms(self.completed),
+            'sentences': self.sentences,
+        }
+
+
+class VoicePipeline:
+    """Overlapped STT -> LLM -> TTS pipeline for a single voice turn.
+
+    The LLM reply is streamed and cut at sentence boundaries; each sentence is
+    sent to TTS as soon as it is complete, and audio is yielded in order while
+    later sentences are still being generated.
+    """
+
+    def __init__(self, clients, context: str, history: List,
+                 language_code: str = "fr-FR",
+                 voice_name: str = "fr-FR-Wavenet-C",
+                 sample_rate: int = 16000,
+                 speaking_rate: float = 1.0,
+                 max_parallel_tts: int = 3,
+                 tts_cache: Optional[TTSCache] = None):
+        self.clients = clients
+        self.context = context
+        self.history = history
+        self.language_code = language_code
+        self.voice_name = voice_name
+        self.sample_rate = sample_rate
+        self.speaking_rate = speaking_rate
+        self._tts_slots = asyncio.Semaphore(max_parallel_tts)
+        self.tts_cache = tts_cache
+
+    async def _recognize(self, audio_data: bytes) -> Optional[str]:
+        async with self.clients.speech.borrow() as speech_client:
+            response = await run_io(
+                speech_client.recognize,
+                config=speech_v1.RecognitionConfig(
+                    encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+                    sample_rate_hertz=self.sample_rate,
+                    language_code=self.language_code,
+                    enable_automatic_punctuation=True,
+                ),
+                audio=speech_v1.RecognitionAudio(content=audio_data)
+            )
+        if not response.results:
+            return None
+        return " ".join(
+            result.alternatives[0].transcript
+            for result in response.results
+            if result.alternatives
+        ).strip() or None
+
+    async def synthesize(self, text: str) -> bytes:
+        """LINEAR16 audio for ``text``, from the TTS cache when one is configured"""
+        if self.tts_cache is None:
+            return await self._synthesize(text)
+        key = self.tts_cache.key(text, self.voice_name, self.language_code,
+                                 self.speaking_rate, 'LINEAR16', self.sample_rate)
+        return await self.tts_cache.get_or_synthesize(key, lambda: self._synthesize(text))
+
+    async def _synthesize(self, text: str) -> bytes:
+        async with self._tts_slots, self.clients.tts.borrow() as tts_client:
+            response = await run_io(
+                tts_client.synthesize_speech,
+                input=texttospeech.SynthesisInput(text=text),
+                voice=texttospeech.VoiceSelectionParams(
+                    language_code=self.language_code,
+                    name=self.voice_name,
+                ),
+                audio_config=texttospeech.AudioConfig(
+                    audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+                    sample_rate_hertz=self.sample_rate,
+                    speaking_rate=self.speaking_rate,
+                )
+            )
+            return response.audio_content
+
+    async def _generate(self, transcript: str, timings: StageTimings,
+                        pending: asyncio.Queue, reply: List[str]) -> None:
+        """Stream the LLM reply and schedule TTS for every finished sentence."""
+        splitter = SentenceSplitter()
+
+        def schedule(sentence: str) -> None:
+            timings.mark('first_sentence')
+            timings.sentences += 1
+            task = asyncio.create_task(self.synthesize(sentence))
+            pending.put_nowait((sentence, task))
+
+        try:
+            async with self.clients.gemini.borrow() as model:
+                chat = ContextChat(model, self.context, self.history)
+                response = await chat.send(transcript, stream=True)
+                async for chunk in response:
+                    text = chunk.text
+                    if not text:
+                        continue
+                    timings.mark('llm_first_token')
+                    reply.append(text)
+                    for sentence in splitter.feed(text):
+                        schedule(sentence)
+                self.history = chat.history
+
+            tail = splitter.flush()
+            if tail:
+                schedule(tail)
+        finally:
+            pending.put_nowait(None)
+
+    async def run(self, audio_data: bytes) -> AsyncIterator[Dict]:
+        """Process one utterance, yielding transcript, audio and timing events.
+
+        Audio events carry raw LINEAR16 bytes; encoding for the wire is up to
+        the caller.
+        """
+        timings = StageTimings()
+        transcript = await self._recognize(audio_data)
+        timings.mark('stt_done')
+        if not transcript:
+            return
+
+        yield {'type': 'transcript', 'transcript': transcript}
+
+        pending: asyncio.Queue = asyncio.Queue()
+        reply: List[str] = []
+        producer = asyncio.create_task(self._generate(transcript, timings, pending, reply))
+        seq = 0
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                sentence, task = item
+                audio = await task
+                timings.mark('first_audio')
+                yield {
+                    'type': 'audio',
+                    'seq': seq,
+                    'text': sentence,
+                    'audio': audio
+                }
+                seq += 1
+
+            # Surface LLM errors raised after the last sentence was queued
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+
+        timings.mark('completed')
+        stage_times = timings.as_dict()
+        logger.info(f"Voice pipeline timings: {stage_times}")
+        metrics.observe_voice_timings(stage_times)
+        yield {
+            'type': 'done',
+            'transcript': transcript,
+            'response': "".join(reply),
+            'timings': stage_times
+        }
@@ -0,0 +1,79 @@
+"""Binary audio framing for the /voice-chat websocket.
+
+Every binary frame is a fixed 16-byte little-endian header followed by raw
+samples:
+
+    uint8   version     FRAME_VERSION
+    uint8   format      FORMAT_F32 or FORMAT_S16
+    uint16  flags       FLAG_FINAL marks the last frame of an utterance
+    uint32  seq         per-direction sequence number
+    float64 timestamp   sender clock, milliseconds since the epoch
+
+Control messages (config, transcripts, errors) stay orjson text frames.
+The frontend encoder lives in frontend/src/workers/audioProcessor.js.
+"""
+import struct
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+FRAME_HEADER = struct.Struct('<BBHId')
+FRAME_VERSION = 1
+
+FORMAT_F32 = 1
+FORMAT_S16 = 2
+FORMAT_DTYPES = {
+    FORMAT_F32: np.dtype('<f4'),
+    FORMAT_S16: np.dtype('<i2'),
+}
+
+FLAG_FINAL = 0x1
+
+
+class FrameError(ValueError):
+    pass
+
+
+@dataclass
+class AudioFrame:
+    seq: int
+    timestamp_ms: float
+    format: int
+    final: bool
+    samples: np.ndarray  # read-only view into the received message
+
+
+def decode_frame(data: bytes) -> AudioFrame:
+    """Parse a binary frame; the samples are a view, not a copy"""
+    if len(data) < FRAME_HEADER.size:
+        raise FrameError(f"Frame too short ({len(data)} bytes)")
+    version, fmt, flags, seq, timestamp_ms = FRAME_HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    dtype = FORMAT_DTYPES.get(fmt)
+    if dtype is None:
+        raise FrameError(f"Unknown audio format {fmt}")
+    payload = len(data) - FRAME_HEADER.size
+    if payload % dtype.itemsize:
+        raise FrameError(f"Payload of {payload} bytes is not whole {dtype} samples")
+    samples = np.frombuffer(data, dtype=dtype, offset=FRAME_HEADER.size)
+    return AudioFrame(seq, timestamp_ms, fmt, bool(flags & FLAG_FINAL), samples)
+
+
+def to_pcm16(samples: np.ndarray) -> np.ndarray:
+    """Samples as 16-bit PCM; floats are clipped to [-1, 1] and scaled like the frontend does"""
+    if samples.dtype == np.int16:
+        return samples
+    clipped = np.clip(samples, -1.0, 1.0)
+    return np.where(clipped < 0, clipped * 0x8000, clipped * 0x7fff).astype(np.int16)
+
+
+def encode_frame(payload, seq: int, fmt: int = FORMAT_S16, final: bool = False,
+                 timestamp_ms: Optional[float] = None) -> bytes:
+    """Header plus ``payload`` (any buffer of samples in ``fmt``) as one message"""
+    if timestamp_ms is None:
+        timestamp_ms = time.time() * 1000
+    header = FRAME_HEADER.pack(FRAME_VERSION, fmt, FLAG_FINAL if final else 0, seq, timestamp_ms)
+    return b''.join((header, payload))
@@ -152,7 +152,7 @@ function KnowledgePage({ db, businessId }) {
         setConversation(newHistory);
         setUserInput(''); setIsLoading(true);
         try {
-            const response = await fetch('http://localhost:5000/api/onboarding-chat', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ history: newHistory }) });
+            const response = await fetch('http://localhost:5000/api/onboarding-chat', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ history: newHistory, business_id: businessId }) });
             if (!response.ok) throw new Error("Erreur réseau");
             const data = await response.json();
             setConversation([...newHistory, { role: 'model', parts: [{ text: data.reply }] }]);
@@ -7,6 +7,8 @@ export const RealTimeMetrics = ({ businessId }) => {
     successRate: 0,
     averageDuration: 0
   });
+  // Rolling window of backend performance snapshots (see /metrics/<businessId>)
+  const [performance, setPerformance] = useState([]);
   const [error, setError] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
 
@@ -22,12 +24,20 @@ export const RealTimeMetrics = ({ businessId }) => {
 
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
-      setMetrics(data);
+      if (data.type === 'ping') return;
+      if (data.voice) {
+        setPerformance(prev => [...prev.slice(-59), { at: new Date().toLocaleTimeString(), ...data }]);
+      } else {
+        setMetrics(prev => ({ ...prev, ...data }));
+      }
     };
 
     return () => ws.close();
   }, [businessId]);
 
+  const latest = performance[performance.length - 1];
+  const inFlight = latest ? latest.routes.reduce((sum, r) => sum + r.in_flight, 0) : 0;
+
   if (error) return <div className="text-red-400">{error}</div>;
   if (isLoading) return <div>Loading metrics...</div>;
 
@@ -43,6 +53,32 @@ export const RealTimeMetrics = ({ businessId }) => {
           <p className="text-2xl font-bold">{metrics.averageDuration}s</p>
         </div>
       </div>
+      {latest && (
+        <div className="grid grid-cols-3 gap-4">
+          <div className="p-4 bg-gray-800 rounded-lg">
+            <h3>Time to First Audio (p50)</h3>
+            <p className="text-2xl font-bold">{latest.voice.time_to_first_audio.p50_ms ?? '–'} ms</p>
+          </div>
+          <div className="p-4 bg-gray-800 rounded-lg">
+            <h3>Event Loop Lag</h3>
+            <p className="text-2xl font-bold">{latest.event_loop_lag.avg_ms} ms</p>
+          </div>
+          <div className="p-4 bg-gray-800 rounded-lg">
+            <h3>Active Requests</h3>
+            <p className="text-2xl font-bold">{inFlight}</p>
+          </div>
+        </div>
+      )}
+      {performance.length > 1 && (
+        <Line data={{
+          labels: performance.map(p => p.at),
+          datasets: [{
+            label: 'Voice turn p95 (ms)',
+            data: performance.map(p => p.voice.total.p95_ms),
+            borderColor: '#10b981'
+          }]
+        }} />
+      )}
       {metrics.callsPerHour.length > 0 && (
         <Line data={{ 
           labels: metrics.callsPerHour.map(d => d.hour),
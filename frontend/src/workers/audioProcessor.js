@@ -112,7 +112,73 @@ const audioProcessor = {
   }
 };
 
+// Binary /voice-chat frames, mirroring backend/ws_frames.py: a 16-byte
+// little-endian header (version, format, flags, seq, timestamp) followed by
+// raw samples. Typed arrays use host byte order, which is little-endian on
+// every platform we ship to.
+const audioFrames = {
+  VERSION: 1,
+  HEADER_BYTES: 16,
+  FORMAT_F32: 1,
+  FORMAT_S16: 2,
+  FLAG_FINAL: 0x1,
+
+  encode(samples, seq, { final = false, format = 2, timestamp = Date.now() } = {}) {
+    const bytesPerSample = format === this.FORMAT_F32 ? 4 : 2;
+    const buffer = new ArrayBuffer(this.HEADER_BYTES + samples.length * bytesPerSample);
+    const header = new DataView(buffer, 0, this.HEADER_BYTES);
+    header.setUint8(0, this.VERSION);
+    header.setUint8(1, format);
+    header.setUint16(2, final ? this.FLAG_FINAL : 0, true);
+    header.setUint32(4, seq, true);
+    header.setFloat64(8, timestamp, true);
+
+    if (format === this.FORMAT_F32) {
+      new Float32Array(buffer, this.HEADER_BYTES).set(samples);
+    } else {
+      const out = new Int16Array(buffer, this.HEADER_BYTES);
+      for (let i = 0; i < samples.length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[i]));
+        out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+      }
+    }
+    return buffer;
+  },
+
+  decode(buffer) {
+    const header = new DataView(buffer, 0, this.HEADER_BYTES);
+    const version = header.getUint8(0);
+    if (version !== this.VERSION) {
+      throw new Error(`Unsupported frame version ${version}`);
+    }
+    const format = header.getUint8(1);
+    const SampleArray = format === this.FORMAT_F32 ? Float32Array : Int16Array;
+    return {
+      format,
+      final: (header.getUint16(2, true) & this.FLAG_FINAL) !== 0,
+      seq: header.getUint32(4, true),
+      timestamp: header.getFloat64(8, true),
+      samples: new SampleArray(buffer, this.HEADER_BYTES),
+    };
+  }
+};
+
 self.onmessage = async (e) => {
+  const { type } = e.data;
+
+  if (type === 'encodeFrame') {
+    const { samples, seq, final, format } = e.data;
+    const frame = audioFrames.encode(samples, seq, { final, format });
+    self.postMessage({ type, seq, frame }, [frame]);
+    return;
+  }
+
+  if (type === 'decodeFrame') {
+    const decoded = audioFrames.decode(e.data.frame);
+    self.postMessage({ type, ...decoded }, [decoded.samples.buffer]);
+    return;
+  }
+
   const { audioData } = e.data;
   const processed = await audioProcessor.processAudio(audioData);
   self.postMessage({ processed });